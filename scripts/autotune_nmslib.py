@@ -0,0 +1,71 @@
+import sys
+from pathlib import Path
+from typing import Callable, Optional
+
+import nmslib
+import pandas as pd
+from jsonargparse import CLI
+
+sys.path.append(str(Path(__file__).parents[1]))
+
+from src.utils.nnblocker import (
+    NMSLIBIndexer,
+    SparseCosineIndexer,
+    SparseVectorizer,
+    autotune,
+)
+
+
+def autotune_nmslib(
+    data_dir: str = "./data/blocking/cora",
+    size: str = "",
+    index_col: str = "id",
+    tokenizer: Optional[Callable] = None,
+    n_neighbors: int = 100,
+    target_recall: float = 0.95,
+    M: list[int] = [8, 16, 30],
+    efC: list[int] = [100, 200, 500, 1000],
+    efS: list[int] = [100, 200, 400, 800],
+    threads: int = 12,
+):
+    """Find the cheapest HNSW parameters of nmslib_join that reach a target recall."""
+    table_paths = sorted(Path(data_dir).glob(f"[1-2]*{size}.csv"))
+    dfs = [pd.read_csv(p, index_col=index_col) for p in table_paths]
+
+    vectorizer = SparseVectorizer(dfs[-1], vectorizer_kwargs={"tokenizer": tokenizer})
+    data, queries = vectorizer(dfs[-1]), vectorizer(dfs[0])
+
+    def make_indexer(M: int, efC: int) -> NMSLIBIndexer:
+        return NMSLIBIndexer(
+            init_kwargs={
+                "method": "hnsw",
+                "space": "cosinesimil_sparse",
+                "data_type": nmslib.DataType.SPARSE_VECTOR,
+            },
+            index_params={"M": M, "indexThreadQty": threads, "efConstruction": efC},
+            query_params={},
+            threads=threads,
+        )
+
+    frontier_path = (
+        Path("results") / "autotune" / "nmslib" / f"{Path(data_dir).name}{size}.jsonl"
+    )
+    frontier_path.parent.mkdir(parents=True, exist_ok=True)
+    result = autotune(
+        make_indexer,
+        data,
+        SparseCosineIndexer(n_jobs=threads),
+        build_grid={"M": M, "efC": efC},
+        search_grid={"efSearch": efS},
+        queries=queries,
+        k=n_neighbors,
+        target_recall=target_recall,
+        frontier_path=frontier_path,
+    )
+
+    print(result.best)
+    return result.best._asdict()
+
+
+if __name__ == "__main__":
+    CLI(autotune_nmslib)
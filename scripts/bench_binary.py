@@ -0,0 +1,62 @@
+import json
+import sys
+from pathlib import Path
+from typing import Optional
+
+import faiss
+import pandas as pd
+import torch.nn as nn
+from jsonargparse import CLI
+from torch.utils.data.dataloader import default_collate
+
+sys.path.append(str(Path(__file__).parents[1]))
+
+from src.utils.nnblocker import (
+    BinaryIndexer,
+    DenseVectorizer,
+    FaissIndexer,
+    autotune,
+)
+
+
+def bench_binary(
+    model: nn.Module,
+    data_dir: str = "./data/blocking/cora",
+    index_col: str = "id",
+    n_neighbors: int = 100,
+    refine: list[Optional[float]] = [None, 2, 5, 10, 20],
+    device_id: Optional[int] = 0,
+    threads: int = 12,
+):
+    """Compare the recall, QPS and size of BinaryIndexer against a Flat index."""
+    table_paths = sorted(Path(data_dir).glob("[1-2]*.csv"))
+    dfs = [pd.read_csv(p, index_col=index_col) for p in table_paths]
+
+    collate_fn = getattr(model, "collate_fn", default_collate)
+    model = model.to(device_id)
+    vectorizer = DenseVectorizer(model, collate_fn, device_id)
+    data, queries = vectorizer(dfs[-1]), vectorizer(dfs[0])
+
+    exact = FaissIndexer(
+        index_factory="Flat", metric_type=faiss.METRIC_INNER_PRODUCT, threads=threads
+    )
+    frontier_path = Path("results") / "bench_binary" / f"{Path(data_dir).name}.jsonl"
+    frontier_path.parent.mkdir(parents=True, exist_ok=True)
+    result = autotune(
+        lambda threshold: BinaryIndexer(threshold, threads=threads),
+        data,
+        exact,
+        build_grid={"threshold": ["sign", "median"]},
+        search_grid={"refine": refine},
+        queries=queries,
+        k=n_neighbors,
+        frontier_path=frontier_path,
+    )
+
+    print(f"Flat index size: {exact.index_nbytes} bytes")
+    for point in result.frontier:
+        print(json.dumps(point._asdict()))
+
+
+if __name__ == "__main__":
+    CLI(bench_binary)
@@ -0,0 +1,62 @@
+import json
+import sys
+import tempfile
+from pathlib import Path
+from typing import Callable, Optional
+
+import pandas as pd
+from jsonargparse import CLI
+
+sys.path.append(str(Path(__file__).parents[1]))
+
+from src.utils.nnblocker import LuceneIndexer, SparseConverter, autotune
+
+
+def bench_lucene_clauses(
+    data_dir: str = "./data/blocking/cora",
+    size: str = "",
+    index_col: str = "id",
+    tokenizer: Optional[Callable] = None,
+    n_neighbors: int = 100,
+    max_clauses: list[Optional[int]] = [None, 16, 32, 64, 128, 256],
+    n_queries: int = 1000,
+    threads: int = 12,
+):
+    """Trade Lucene query throughput for recall by capping the query clauses."""
+    table_paths = sorted(Path(data_dir).glob(f"[1-2]*{size}.csv"))
+    dfs = [pd.read_csv(p, index_col=index_col) for p in table_paths]
+
+    if tokenizer is None:
+        from py_stringmatching.tokenizer.qgram_tokenizer import QgramTokenizer
+
+        tokenizer = QgramTokenizer(qval=5).tokenize
+
+    vectorizer = SparseConverter(tokenizer=tokenizer)
+    # positional rows, as autotune samples the queries by position
+    data = vectorizer(dfs[-1]).reset_index(drop=True)
+    queries = vectorizer(dfs[0]).reset_index(drop=True)
+
+    frontier_path = (
+        Path("results") / "bench_lucene" / f"{Path(data_dir).name}{size}.jsonl"
+    )
+    frontier_path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        Path(tmpdir, "exact").mkdir()
+        Path(tmpdir, "capped").mkdir()
+        result = autotune(
+            lambda: LuceneIndexer(save_dir=Path(tmpdir, "capped"), threads=threads),
+            data,
+            LuceneIndexer(save_dir=Path(tmpdir, "exact"), threads=threads),
+            search_grid={"max_clauses": max_clauses},
+            queries=queries,
+            n_queries=n_queries,
+            k=n_neighbors,
+            frontier_path=frontier_path,
+        )
+
+    for point in result.frontier:
+        print(json.dumps(point._asdict()))
+
+
+if __name__ == "__main__":
+    CLI(bench_lucene_clauses)
@@ -0,0 +1,66 @@
+import sys
+import time
+from itertools import combinations
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from jsonargparse import CLI
+
+sys.path.append(str(Path(__file__).parents[1]))
+
+from src.utils.nnblocker import NNBlocker, SklearnIndexer, SparseVectorizer
+
+
+def _scores(candidates) -> pd.DataFrame:
+    # the scores at each rank of each query; tied neighbors may come in any order
+    scores = candidates.to_frame()[["left", "rank", "score"]].round({"score": 5})
+    return scores.sort_values(["left", "rank"]).reset_index(drop=True)
+
+
+def bench_multi_source(
+    data_dir: str = "./data/blocking/cora",
+    index_col: str = "id",
+    n_sources: int = 4,
+    n_neighbors: int = 100,
+    threads: int = 12,
+):
+    """Compare NNBlocker.multi_source with running every pairwise join in turn."""
+    table_paths = sorted(Path(data_dir).glob("[1-2]*.csv"))
+    df = pd.concat([pd.read_csv(p, index_col=index_col) for p in table_paths])
+    # split the records into n_sources disjoint tables
+    sources = np.random.default_rng(0).integers(n_sources, size=len(df))
+    dfs = [df[sources == i] for i in range(n_sources)]
+
+    vectorizer = SparseVectorizer(
+        df, vectorizer_kwargs={"analyzer": "char_wb", "ngram_range": (5, 5)}
+    )
+    indexer = SklearnIndexer(init_kwargs={"metric": "cosine", "n_jobs": threads})
+
+    start = time.perf_counter()
+    pairwise = {
+        (i, j): NNBlocker([dfs[i], dfs[j]], vectorizer, indexer)(k=n_neighbors)
+        for i, j in combinations(range(n_sources), 2)
+    }
+    pairwise_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    NNBlocker(dfs, vectorizer, indexer).multi_source(k=n_neighbors)
+    multi_source_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    shared = NNBlocker(dfs, vectorizer, indexer).multi_source(
+        k=n_neighbors, shared_index=True
+    )
+    shared_index_time = time.perf_counter() - start
+    # with an exact index the shared index finds the pairwise neighbors
+    same = all(_scores(pairwise[key]).equals(_scores(shared[key])) for key in pairwise)
+
+    print(f"Pairwise time: {pairwise_time * 1000:.0f} ms")
+    print(f"Multi-source time: {multi_source_time * 1000:.0f} ms")
+    print(f"Multi-source (shared index) time: {shared_index_time * 1000:.0f} ms")
+    print(f"Same neighbors as pairwise: {same}")
+
+
+if __name__ == "__main__":
+    CLI(bench_multi_source)
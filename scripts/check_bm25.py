@@ -0,0 +1,58 @@
+import json
+import sys
+import tempfile
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+from jsonargparse import CLI
+
+sys.path.append(str(Path(__file__).parents[1]))
+
+from src.utils.nnblocker import BM25Indexer, LuceneIndexer, SparseConverter
+from src.utils.nnblocker.autotune import recall_at_k
+
+
+def check_bm25(
+    data_dir: str = "./data/blocking/cora",
+    size: str = "",
+    index_col: str = "id",
+    tokenizer: Optional[Callable] = None,
+    n_neighbors: int = 100,
+    n_queries: int = 1000,
+    threads: int = 12,
+):
+    """Compare the neighbors and scores of BM25Indexer with pyserini's Lucene."""
+    table_paths = sorted(Path(data_dir).glob(f"[1-2]*{size}.csv"))
+    dfs = [pd.read_csv(p, index_col=index_col) for p in table_paths]
+
+    if tokenizer is None:
+        from py_stringmatching.tokenizer.qgram_tokenizer import QgramTokenizer
+
+        tokenizer = QgramTokenizer(qval=5).tokenize
+
+    vectorizer = SparseConverter(tokenizer=tokenizer)
+    data, queries = vectorizer(dfs[-1]), vectorizer(dfs[0]).iloc[:n_queries]
+
+    bm25 = BM25Indexer(threads=threads)
+    bm25.build_index(data)
+    scores, indices = bm25.batch_search(queries, k=n_neighbors)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        lucene = LuceneIndexer(save_dir=tmpdir, threads=threads)
+        lucene.build_index(data)
+        lucene_scores, lucene_indices = lucene.batch_search(queries, k=n_neighbors)
+
+    # Lucene stores document lengths lossily, so scores only agree approximately
+    rel_error = np.abs(scores - lucene_scores) / np.abs(lucene_scores)
+    report = {
+        "recall": recall_at_k(indices, lucene_indices),
+        "top1_agreement": float(np.mean(indices[:, 0] == lucene_indices[:, 0])),
+        "score_rel_error": float(np.nanmedian(rel_error)),
+    }
+    print(json.dumps(report))
+    return report
+
+
+if __name__ == "__main__":
+    CLI(check_bm25)
@@ -0,0 +1,81 @@
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from jsonargparse import CLI
+
+sys.path.append(str(Path(__file__).parents[1]))
+
+from src.utils.nnblocker import BruteForceIndexer, IncrementalNNBlocker, NNBlocker
+
+
+def _vectorize(df: pd.DataFrame) -> np.ndarray:
+    return df.to_numpy(np.float32)
+
+
+def _pairs(candidates, dirty: bool) -> set:
+    pairs = zip(candidates.left_ids.tolist(), candidates.right_ids.tolist())
+    return {frozenset(p) for p in pairs} if dirty else set(pairs)
+
+
+def _table(rng, prefix: str, start: int, n: int, dim: int) -> pd.DataFrame:
+    index = pd.Index([f"{prefix}{i}" for i in range(start, start + n)], name="id")
+    return pd.DataFrame(rng.standard_normal((n, dim)), index=index)
+
+
+def check_incremental(
+    n_records: int = 2000,
+    dim: int = 16,
+    n_neighbors: int = 10,
+    n_updates: int = 5,
+    n_changes: int = 50,
+    seed: int = 0,
+):
+    """
+    Compare the pairs ``IncrementalNNBlocker.update`` adds and removes with the
+    difference between two full ``NNBlocker`` runs, on random vectors searched
+    exactly (so that there are no ties), for dirty ER and both sides of
+    clean-clean ER.
+    """
+    rng = np.random.default_rng(seed)
+    report = {}
+    for name, n_tables, table in [("dirty", 1, -1), ("data", 2, -1), ("query", 2, 0)]:
+        dfs = [_table(rng, f"t{i}-", 0, n_records, dim) for i in range(n_tables)]
+        blocker = IncrementalNNBlocker(
+            dfs, _vectorize, BruteForceIndexer("l2"), compact_ratio=0.05
+        )
+        pairs = _pairs(blocker(k=n_neighbors), n_tables == 1)
+
+        n_ok, n_next = 0, n_records
+        for _ in range(n_updates):
+            df = dfs[table]
+            changed = rng.choice(df.index, 2 * n_changes, replace=False)
+            upserts = pd.concat(
+                [
+                    _table(rng, "", 0, n_changes, dim).set_axis(changed[:n_changes]),
+                    _table(rng, f"t{table % n_tables}-", n_next, 10, dim),
+                ]
+            )
+            deletes = changed[n_changes:]
+            n_next += 10
+            added, removed = blocker.update(upserts, deletes, table=table)
+
+            df = pd.concat([df.drop(index=[*changed]), upserts])
+            dfs[table] = df
+            rerun = NNBlocker(dfs, _vectorize, BruteForceIndexer("l2"))
+            rerun = _pairs(rerun(k=n_neighbors), n_tables == 1)
+            n_ok += (
+                _pairs(added, n_tables == 1) == rerun - pairs
+                and _pairs(removed, n_tables == 1) == pairs - rerun
+            )
+            pairs = rerun
+        report[name] = f"{n_ok}/{n_updates} updates match a full rerun"
+
+    print(json.dumps(report))
+    return report
+
+
+if __name__ == "__main__":
+    CLI(check_incremental)
@@ -1,3 +1,4 @@
+import json
 import sys
 from pathlib import Path
 
@@ -14,6 +15,8 @@ def main():
         if d.name in ["songs", "citeseer-dblp"]
     ]
     sizes = [100, 1000, 10000, 100000, 1000000]
+    stats_file = Path("results") / "scalability" / "faiss_join.jsonl"
+    stats_file.parent.mkdir(parents=True, exist_ok=True)
 
     model = UniBlocker(
         model_name_or_path="roberta-base",
@@ -23,7 +26,9 @@ def main():
         print(d.name)
         for i in sizes:
             print(i)
-            faiss_join(model=model, data_dir=d, size=str(i))
+            stats = faiss_join(model=model, data_dir=d, size=str(i))
+            with stats_file.open("a") as f:
+                f.write(json.dumps({"data": d.name, "size": i, **stats}) + "\n")
 
 
 if __name__ == "__main__":
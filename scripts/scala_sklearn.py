@@ -1,3 +1,4 @@
+import json
 import re
 import sys
 from pathlib import Path
@@ -21,6 +22,8 @@ def main():
         if d.name in ["songs", "citeseer-dblp"]
     ]
     sizes = [100, 1000, 10000, 100000, 1000000]
+    stats_file = Path("results") / "scalability" / "sparse_join.jsonl"
+    stats_file.parent.mkdir(parents=True, exist_ok=True)
 
     for d in data_dirs:
         print(d.name)
@@ -32,7 +35,11 @@ def main():
                 QgramTokenizer(qval=5).tokenize,
             ]
             for tokenizer in tokenizers:
-                sparse_join(data_dir=d, size=str(i), tokenizer=tokenizer)
+                stats = sparse_join(data_dir=d, size=str(i), tokenizer=tokenizer)
+                tokenizer_name = getattr(tokenizer, "__qualname__", str(tokenizer))
+                record = {"data": d.name, "size": i, "tokenizer": tokenizer_name}
+                with stats_file.open("a") as f:
+                    f.write(json.dumps({**record, **stats}) + "\n")
 
 
 if __name__ == "__main__":
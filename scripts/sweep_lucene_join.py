@@ -4,9 +4,9 @@ import sys
 from pathlib import Path
 from typing import Callable, Optional
 
+import ray
 import wandb
 from jsonargparse import CLI
-import ray
 from ray import air, tune
 
 sys.path.append(str(Path(__file__).parents[1]))
@@ -17,6 +17,7 @@ ray.init(
     _temp_dir=str(Path.home() / ".cache" / "ray"), num_cpus=min(os.cpu_count(), 32)
 )
 
+
 def run_lucene_join(config):
     os.chdir(os.environ["TUNE_ORIG_WORKING_DIR"])
 
@@ -29,7 +30,10 @@ def run_lucene_join(config):
         tags=["baseline"],
     )
     metrics = lucene_join(**config)
+    sweep = metrics.pop("sweep")
     wandb.log(metrics)
+    rows = [list(r.values()) for r in sweep]
+    wandb.log({"sweep": wandb.Table(columns=list(sweep[0]), data=rows)})
     wandb.finish()
 
     dirpath = Path("results") / "sparse_join" / data_dir_name
@@ -38,12 +42,16 @@ def run_lucene_join(config):
     metrics_file = Path(dirpath) / "metrics.json"
     with metrics_file.open("w") as f:
         f.write(metrics_str)
+    sweep_file = Path(dirpath) / "sweep.json"
+    with sweep_file.open("w") as f:
+        f.write(json.dumps(sweep, ensure_ascii=False, indent=2))
 
 
 def sweep_lucene_join(
     data_dirs: list[str] = [],
     tokenizers: list[Optional[Callable]] = [None],
     n_neighbors: list[int] = [100],
+    thresholds: list[float] = [0.9],
 ):
     data_dirs = data_dirs or [
         str(d)
@@ -63,7 +71,10 @@ def sweep_lucene_join(
     param_space = {
         "data_dir": tune.grid_search(data_dirs),
         "tokenizer": tune.grid_search(tokenizers),
-        "n_neighbors": tune.grid_search(n_neighbors),
+        # one run at the largest k evaluates all of them
+        "n_neighbors": max(n_neighbors),
+        "ks": n_neighbors,
+        "thresholds": thresholds,
     }
     tune_config = tune.TuneConfig()
     run_config = air.RunConfig(
@@ -25,7 +25,10 @@ def run_sparse_join(config):
         tags=["baseline"],
     )
     metrics = sparse_join(**config)
+    sweep = metrics.pop("sweep")
     wandb.log(metrics)
+    rows = [list(r.values()) for r in sweep]
+    wandb.log({"sweep": wandb.Table(columns=list(sweep[0]), data=rows)})
     wandb.finish()
 
     dirpath = Path("results") / "sparse_join" / data_dir_name
@@ -34,12 +37,16 @@ def run_sparse_join(config):
     metrics_file = Path(dirpath) / "metrics.json"
     with metrics_file.open("w") as f:
         f.write(metrics_str)
+    sweep_file = Path(dirpath) / "sweep.json"
+    with sweep_file.open("w") as f:
+        f.write(json.dumps(sweep, ensure_ascii=False, indent=2))
 
 
 def sweep_sparse_join(
     data_dirs: list[str] = [],
     tokenizers: list[Optional[Callable]] = [None],
     n_neighbors: list[int] = [100],
+    thresholds: list[float] = [0.9],
 ):
     data_dirs = data_dirs or [
         str(d)
@@ -64,7 +71,10 @@ def sweep_sparse_join(
     param_space = {
         "data_dir": tune.grid_search(data_dirs),
         "tokenizer": tune.grid_search(tokenizers),
-        "n_neighbors": tune.grid_search(n_neighbors),
+        # one run at the largest k evaluates all of them
+        "n_neighbors": max(n_neighbors),
+        "ks": n_neighbors,
+        "thresholds": thresholds,
     }
     tune_config = tune.TuneConfig()
     run_config = air.RunConfig(
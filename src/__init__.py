@@ -1,4 +1,13 @@
-from . import callbacks, datamodules, models
-from .utils import loggers
+import importlib
 
 __all__ = ["callbacks", "datamodules", "models", "loggers"]
+
+
+def __getattr__(name: str):
+    # torch and lightning are only imported with these, which the baselines and
+    # their worker processes do without
+    if name == "loggers":
+        return importlib.import_module(".utils.loggers", __name__)
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
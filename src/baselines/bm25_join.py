@@ -0,0 +1,52 @@
+from pathlib import Path
+from typing import Callable, Literal, Optional
+
+import pandas as pd
+from jsonargparse import CLI
+from rich import print
+
+from src.utils import GroundTruth, rank_curve
+from src.utils.nnblocker import BM25Indexer, NNBlocker, SparseConverter
+
+
+def bm25_join(
+    data_dir: str = "./data/blocking/cora",
+    size: str = "",
+    index_col: str = "id",
+    tokenizer: Optional[Callable] = None,
+    similarity: Literal["bm25", "tfidf"] = "bm25",
+    n_neighbors: int = 100,
+    ks: Optional[list[int]] = None,
+    thresholds: list[float] = [0.9],
+    threads: int = 12,
+):
+    table_paths = sorted(Path(data_dir).glob(f"[1-2]*{size}.csv"))
+    dfs = [pd.read_csv(p, index_col=index_col) for p in table_paths]
+
+    if tokenizer is None:
+        from py_stringmatching.tokenizer.qgram_tokenizer import QgramTokenizer
+
+        tokenizer = QgramTokenizer(qval=5).tokenize
+
+    vectorizer = SparseConverter(tokenizer=tokenizer)
+    indexer = BM25Indexer(similarity=similarity, threads=threads)
+    blocker = NNBlocker(dfs, vectorizer, indexer)
+    candidates = blocker(k=n_neighbors)
+
+    if size != "":
+        # shortcut for scalability experiments
+        return blocker.stats.to_dict()
+
+    matches = GroundTruth.load(data_dir, index_col=index_col)
+    curve = rank_curve(candidates, matches)
+    metrics = curve.metrics()
+    if ks is not None:
+        # metrics for every k up to n_neighbors, read off this one run
+        metrics["sweep"] = curve.sweep(ks, thresholds)
+
+    print(metrics)
+    return metrics
+
+
+if __name__ == "__main__":
+    CLI(bm25_join)
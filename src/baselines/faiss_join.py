@@ -7,7 +7,7 @@ from jsonargparse import CLI
 from rich import print
 from torch.utils.data.dataloader import default_collate
 
-from src.utils import evaluate
+from src.utils import GroundTruth, evaluate
 from src.utils.nnblocker import DenseVectorizer, FaissIndexer, NNBlocker
 
 
@@ -19,6 +19,8 @@ def faiss_join(
     n_neighbors: int = 100,
     device_id: Optional[int] = 0,
     threads: int = 12,
+    cache_dir: Optional[str] = None,
+    save_candidates: Optional[str] = None,
 ):
     table_paths = sorted(Path(data_dir).glob(f"[1-2]*{size}.csv"))
     dfs = [pd.read_csv(p, index_col=index_col) for p in table_paths]
@@ -27,16 +29,19 @@ def faiss_join(
     model = model.to(device_id)
 
     vectorizer = DenseVectorizer(model, collate_fn, device_id)
-    indexer = FaissIndexer(device_id=device_id, threads=threads)
+    indexer = FaissIndexer(device_id=device_id, threads=threads, cache_dir=cache_dir)
     blocker = NNBlocker(dfs, vectorizer, indexer)
     candidates = blocker(k=n_neighbors)
+    if save_candidates is not None:
+        # e.g. results/debug/dense for notebooks/ensemble.ipynb
+        Path(save_candidates).mkdir(parents=True, exist_ok=True)
+        candidates.save(Path(save_candidates) / f"{Path(data_dir).name}{size}.parquet")
 
     if size != "":
         # shortcut for scalability experiments
-        return
+        return blocker.stats.to_dict()
 
-    matches_path = Path(data_dir) / "matches.csv"
-    matches = set(pd.read_csv(matches_path).itertuples(index=False, name=None))
+    matches = GroundTruth.load(data_dir, index_col=index_col)
     metrics = evaluate(candidates, matches)
 
     print(metrics)
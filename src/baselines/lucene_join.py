@@ -1,4 +1,6 @@
+import hashlib
 import tempfile
+from contextlib import nullcontext
 from pathlib import Path
 from typing import Callable, Optional
 
@@ -6,18 +8,34 @@ import pandas as pd
 from jsonargparse import CLI
 from rich import print
 
-from src.utils import evaluate
+from src.utils import GroundTruth, rank_curve
 from src.utils.nnblocker import LuceneIndexer, NNBlocker, SparseConverter
 
 
+def tokenizer_key(tokenizer: Callable) -> str:
+    """A short name of the tokenizer and its settings that is stable across runs."""
+    owner = getattr(tokenizer, "__self__", None)
+    settings = vars(owner) if hasattr(owner, "__dict__") else owner
+    name = getattr(tokenizer, "__qualname__", type(tokenizer).__qualname__)
+    return hashlib.blake2b(f"{name}|{settings!r}".encode(), digest_size=8).hexdigest()
+
+
 def lucene_join(
     data_dir: str = "./data/blocking/cora",
     size: str = "",
     index_col: str = "id",
     tokenizer: Optional[Callable] = None,
     n_neighbors: int = 100,
+    ks: Optional[list[int]] = None,
+    thresholds: list[float] = [0.9],
     threads: int = 12,
+    max_clauses: Optional[int] = None,
+    index_dir: Optional[str] = None,
 ):
+    """
+    With ``index_dir``, the Lucene index of each dataset, size and tokenizer is
+    kept there and refreshed with the changed records on later runs.
+    """
     table_paths = sorted(Path(data_dir).glob(f"[1-2]*{size}.csv"))
     dfs = [pd.read_csv(p, index_col=index_col) for p in table_paths]
 
@@ -26,19 +44,32 @@ def lucene_join(
         from py_stringmatching.tokenizer.qgram_tokenizer import QgramTokenizer
         tokenizer = QgramTokenizer(qval=5).tokenize
 
-    with tempfile.TemporaryDirectory() as tmpdir:
+    if index_dir is None:
+        save_context = tempfile.TemporaryDirectory()
+    else:
+        key = f"{Path(data_dir).name}{size}-{tokenizer_key(tokenizer)}"
+        save_dir = Path(index_dir) / key
+        save_dir.mkdir(parents=True, exist_ok=True)
+        save_context = nullcontext(save_dir)
+
+    with save_context as save_dir:
         vectorizer = SparseConverter(tokenizer=tokenizer)
-        indexer = LuceneIndexer(save_dir=tmpdir, threads=threads)
+        indexer = LuceneIndexer(
+            save_dir=save_dir, threads=threads, max_clauses=max_clauses
+        )
         blocker = NNBlocker(dfs, vectorizer, indexer)
         candidates = blocker(k=n_neighbors)
 
     if size != "":
         # shortcut for scalability experiments
-        return
+        return blocker.stats.to_dict()
 
-    matches_path = Path(data_dir) / "matches.csv"
-    matches = set(pd.read_csv(matches_path).itertuples(index=False, name=None))
-    metrics = evaluate(candidates, matches)
+    matches = GroundTruth.load(data_dir, index_col=index_col)
+    curve = rank_curve(candidates, matches)
+    metrics = curve.metrics()
+    if ks is not None:
+        # metrics for every k up to n_neighbors, read off this one run
+        metrics["sweep"] = curve.sweep(ks, thresholds)
 
     print(metrics)
     return metrics
@@ -6,7 +6,7 @@ import pandas as pd
 from jsonargparse import CLI
 from rich import print
 
-from src.utils import evaluate
+from src.utils import GroundTruth, rank_curve
 from src.utils.nnblocker import NMSLIBIndexer, NNBlocker, SparseVectorizer
 
 
@@ -16,6 +16,8 @@ def nmslib_join(
     index_col: str = "id",
     tokenizer: Optional[Callable] = None,
     n_neighbors: int = 100,
+    ks: Optional[list[int]] = None,
+    thresholds: list[float] = [0.9],
     M: int = 30,
     efC: int = 1000,
     threads: int = 12,
@@ -39,11 +41,14 @@ def nmslib_join(
 
     if size != "":
         # shortcut for scalability experiments
-        return
-
-    matches_path = Path(data_dir) / "matches.csv"
-    matches = set(pd.read_csv(matches_path).itertuples(index=False, name=None))
-    metrics = evaluate(candidates, matches)
+        return blocker.stats.to_dict()
+
+    matches = GroundTruth.load(data_dir, index_col=index_col)
+    curve = rank_curve(candidates, matches)
+    metrics = curve.metrics()
+    if ks is not None:
+        # metrics for every k up to n_neighbors, read off this one run
+        metrics["sweep"] = curve.sweep(ks, thresholds)
 
     print(metrics)
     return metrics
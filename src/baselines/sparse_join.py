@@ -5,8 +5,8 @@ import pandas as pd
 from jsonargparse import CLI
 from rich import print
 
-from src.utils import evaluate
-from src.utils.nnblocker import NNBlocker, SklearnIndexer, SparseVectorizer
+from src.utils import GroundTruth, rank_curve
+from src.utils.nnblocker import NNBlocker, SparseCosineIndexer, SparseVectorizer
 
 
 def sparse_join(
@@ -15,7 +15,12 @@ def sparse_join(
     index_col: str = "id",
     tokenizer: Optional[Callable] = None,
     n_neighbors: int = 100,
+    ks: Optional[list[int]] = None,
+    thresholds: list[float] = [0.9],
     threads: int = 12,
+    min_score: float = 0.0,
+    batch_size: int = 8192,
+    save_candidates: Optional[str] = None,
 ):
     table_paths = sorted(Path(data_dir).glob(f"[1-2]*{size}.csv"))
     dfs = [pd.read_csv(p, index_col=index_col) for p in table_paths]
@@ -25,17 +30,24 @@ def sparse_join(
     else:
         vectorizer_kwargs = {"tokenizer": tokenizer}
     vectorizer = SparseVectorizer(dfs[-1], vectorizer_kwargs=vectorizer_kwargs)
-    indexer = SklearnIndexer(init_kwargs={"metric": "cosine", "n_jobs": threads})
+    indexer = SparseCosineIndexer(min_score=min_score, n_jobs=threads)
     blocker = NNBlocker(dfs, vectorizer, indexer)
-    candidates = blocker(k=n_neighbors)
+    candidates = blocker(k=n_neighbors, batch_size=batch_size)
+    if save_candidates is not None:
+        # e.g. results/debug/sparse_join for notebooks/ensemble.ipynb
+        Path(save_candidates).mkdir(parents=True, exist_ok=True)
+        candidates.save(Path(save_candidates) / f"{Path(data_dir).name}{size}.parquet")
 
     if size != "":
         # shortcut for scalability experiments
-        return
-
-    matches_path = Path(data_dir) / "matches.csv"
-    matches = set(pd.read_csv(matches_path).itertuples(index=False, name=None))
-    metrics = evaluate(candidates, matches)
+        return blocker.stats.to_dict()
+
+    matches = GroundTruth.load(data_dir, index_col=index_col)
+    curve = rank_curve(candidates, matches)
+    metrics = curve.metrics()
+    if ks is not None:
+        # metrics for every k up to n_neighbors, read off this one run
+        metrics["sweep"] = curve.sweep(ks, thresholds)
 
     print(metrics)
     return metrics
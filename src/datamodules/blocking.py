@@ -9,6 +9,7 @@ from lightning.pytorch.utilities.types import TRAIN_DATALOADERS
 from torch.utils.data import ConcatDataset, DataLoader, Dataset
 
 from src.models import DeepBlocker
+from src.utils import GroundTruth
 
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 warnings.filterwarnings(
@@ -56,7 +57,6 @@ class Blocking(pl.LightningDataModule):
         self.save_hyperparameters()
 
         self.table_paths = sorted(Path(data_dir).glob("[1-2]*.csv"))
-        self.matches_path = Path(data_dir) / "matches.csv"
 
     def setup(self, stage: Optional[str] = None) -> None:
         if not hasattr(self, "datasets"):
@@ -69,8 +69,8 @@ class Blocking(pl.LightningDataModule):
                 self.trainer.model.collate_fn.prepare(ConcatDataset(self.datasets))
 
         if not hasattr(self, "matches"):
-            self.matches = set(
-                pd.read_csv(self.matches_path).itertuples(index=False, name=None)
+            self.matches = GroundTruth.load(
+                self.hparams.data_dir, table_paths=self.table_paths
             )
 
         self.collate_fn = getattr(self.trainer.model, "collate_fn", None)
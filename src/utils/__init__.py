@@ -1,3 +1,19 @@
-from .helpers import chunks, evaluate
+from .ground_truth import GroundTruth
+from .helpers import (
+    RankCurve,
+    chunks,
+    curve_from_ranks,
+    evaluate,
+    evaluate_ranks,
+    rank_curve,
+)
 
-__all__ = ["chunks", "evaluate"]
+__all__ = [
+    "chunks",
+    "evaluate",
+    "evaluate_ranks",
+    "rank_curve",
+    "curve_from_ranks",
+    "RankCurve",
+    "GroundTruth",
+]
@@ -0,0 +1,132 @@
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+
+class GroundTruth:
+    """
+    Matches of a blocking dataset as sorted int64 keys ``left * n_right + right``
+    over the positions of the ids in the first and last table. Matches with ids
+    missing from the tables can never be found but still count in ``len``.
+    """
+
+    def __init__(
+        self,
+        keys: np.ndarray,
+        left_index: pd.Index,
+        right_index: pd.Index,
+        n_matches: Optional[int] = None,
+    ):
+        self.keys = keys
+        self.left_index = pd.Index(left_index)
+        self.right_index = pd.Index(right_index)
+        self.n_matches = len(keys) if n_matches is None else n_matches
+
+    @classmethod
+    def from_pairs(
+        cls,
+        matches: pd.DataFrame,
+        left_index: pd.Index,
+        right_index: pd.Index,
+    ) -> "GroundTruth":
+        """Encode a frame whose first two columns are the left and right ids."""
+        matches = matches.iloc[:, :2].drop_duplicates()
+        left = pd.Index(left_index).get_indexer(matches.iloc[:, 0])
+        right = pd.Index(right_index).get_indexer(matches.iloc[:, 1])
+        found = (left >= 0) & (right >= 0)
+        keys = left[found].astype(np.int64) * max(len(right_index), 1) + right[found]
+        return cls(np.unique(keys), left_index, right_index, len(matches))
+
+    @classmethod
+    def load(
+        cls,
+        data_dir: Union[str, Path],
+        index_col: str = "id",
+        table_paths: Optional[list[Path]] = None,
+    ) -> "GroundTruth":
+        """
+        Load ``matches.csv`` of ``data_dir`` against its ``[1-2]*.csv`` tables.
+        The encoded matches are cached in ``data_dir/matches.gt`` and memory
+        mapped from there until one of the csv files changes.
+        """
+        data_dir = Path(data_dir)
+        if table_paths is None:
+            table_paths = sorted(data_dir.glob("[1-2]*.csv"))
+        matches_path = data_dir / "matches.csv"
+        cache_dir = data_dir / "matches.gt"
+
+        sources = {
+            str(p.name): [p.stat().st_size, p.stat().st_mtime_ns]
+            for p in [matches_path, *table_paths]
+        }
+        meta = {"index_col": index_col, "sources": sources}
+        meta_path = cache_dir / "meta.json"
+        cached = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+        if cached.get("meta") == meta:
+            return cls(
+                np.load(cache_dir / "keys.npy", mmap_mode="r"),
+                np.load(cache_dir / "left_index.npy", allow_pickle=True),
+                np.load(cache_dir / "right_index.npy", allow_pickle=True),
+                cached["n_matches"],
+            )
+
+        indexes = [
+            pd.read_csv(p, usecols=[index_col], index_col=index_col).index
+            for p in (table_paths[0], table_paths[-1])
+        ]
+        gt = cls.from_pairs(pd.read_csv(matches_path), *indexes)
+
+        # written to a temporary directory of this process first, like the
+        # NNBlocker checkpoints, as other runs may load the same dataset at once
+        tmp_dir = Path(tempfile.mkdtemp(prefix="matches.gt.", dir=data_dir))
+        np.save(tmp_dir / "keys.npy", gt.keys)
+        np.save(tmp_dir / "left_index.npy", gt.left_index.to_numpy())
+        np.save(tmp_dir / "right_index.npy", gt.right_index.to_numpy())
+        (tmp_dir / "meta.json").write_text(
+            json.dumps({"meta": meta, "n_matches": gt.n_matches})
+        )
+        cached = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+        if cached.get("meta") != meta:
+            # an outdated cache; a fresh one is another run's and left alone
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        try:
+            os.replace(tmp_dir, cache_dir)
+        except OSError:
+            # another run put its cache in place first
+            shutil.rmtree(tmp_dir)
+            return cls.load(data_dir, index_col, table_paths)
+
+        return gt
+
+    def __len__(self) -> int:
+        return self.n_matches
+
+    def __iter__(self) -> Iterator[tuple]:
+        """Yield the ``(left_id, right_id)`` tuples of the encoded matches."""
+        n_right = max(len(self.right_index), 1)
+        left = self.left_index.to_numpy()[self.keys // n_right]
+        right = self.right_index.to_numpy()[self.keys % n_right]
+        return zip(left.tolist(), right.tolist())
+
+    def contains(self, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+        """Test which pairs of positions into the two tables are matches."""
+        keys = np.asarray(left, dtype=np.int64) * max(len(self.right_index), 1)
+        keys += right
+        pos = np.searchsorted(self.keys, keys)
+        if len(self.keys) == 0:
+            return np.zeros(len(keys), dtype=bool)
+        return self.keys[np.minimum(pos, len(self.keys) - 1)] == keys
+
+    def encode(self, left_index: pd.Index, right_index: pd.Index) -> np.ndarray:
+        """Keys of the matches over positions into other ``left/right_index``."""
+        if left_index.equals(self.left_index) and right_index.equals(self.right_index):
+            return self.keys
+        return GroundTruth.from_pairs(
+            pd.DataFrame(list(self), columns=[0, 1]), left_index, right_index
+        ).keys
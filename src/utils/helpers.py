@@ -1,7 +1,11 @@
-from typing import Any, Iterable, Iterator, Literal
+from typing import Any, Iterable, Iterator, Literal, NamedTuple, Optional, Union
 
+import numpy as np
+import pandas as pd
 from sklearn.metrics import auc
 
+from .ground_truth import GroundTruth
+
 
 def chunks(lst: Iterable, n: int) -> Iterator[Iterable]:
     """Yield successive n-sized chunks from lst."""
@@ -21,39 +25,160 @@ def serialize(record: dict, *, mode: Literal["bare", "tagged", "full"] = "bare")
         raise ValueError(f"Unknown mode: {mode}")
 
 
+class RankCurve(NamedTuple):
+    """
+    Precision and recall of the candidates up to each rank, starting from the
+    point (recall 0, precision 1) before the first rank.
+    """
+
+    precisions: np.ndarray
+    recalls: np.ndarray
+
+    @property
+    def n_ranks(self) -> int:
+        return len(self.recalls) - 1
+
+    def metrics(self, k: Optional[int] = None, threshold: float = 0.9) -> dict:
+        """
+        AP over the curve up to rank ``k`` (all ranks by default) and PC/PQ/F1
+        at the first rank whose recall exceeds ``threshold``, or at ``k``.
+        """
+        k = self.n_ranks if k is None else k
+        if not 0 <= k <= self.n_ranks:
+            raise ValueError(f"k={k} is beyond the {self.n_ranks} ranks of the curve")
+        precisions, recalls = self.precisions[: k + 1], self.recalls[: k + 1]
+
+        above = np.flatnonzero(recalls > threshold)
+        k = int(above[0]) if len(above) else k
+        precision, recall = float(precisions[k]), float(recalls[k])
+        f1 = 2 * (precision * recall) / (precision + recall) if recall else 0.0
+
+        return {
+            "AP": auc(recalls, precisions),
+            "PC": recall,
+            "PQ": precision,
+            "F1": f1,
+            "K": float(k),
+        }
+
+    def sweep(self, ks: Iterable[int], thresholds: Iterable[float] = (0.9,)) -> list:
+        """The ``metrics`` for every combination of ``ks`` and ``thresholds``."""
+        return [
+            {"n_neighbors": k, "threshold": t, **self.metrics(k, t)}
+            for k in ks
+            for t in thresholds
+        ]
+
+
+def curve_from_ranks(
+    rank: np.ndarray,
+    keys: np.ndarray,
+    match_keys: np.ndarray,
+    n_ranks: int,
+    *,
+    n_matches: Optional[int] = None,
+    unique: bool = False,
+) -> RankCurve:
+    """
+    ``rank`` and ``keys`` give the neighbor rank and the int64 key (e.g.
+    ``left * n_right + right``) of every candidate pair, and ``match_keys`` the
+    keys of the matches. ``n_matches`` counts matches that no key can encode too,
+    and defaults to ``len(match_keys)``. Pass ``unique`` if every pair shows up
+    only once to skip finding the rank it first shows up at.
+    """
+    rank, keys = np.asarray(rank), np.asarray(keys, dtype=np.int64)
+    match_keys = np.unique(np.asarray(match_keys, dtype=np.int64))
+    if n_matches is None:
+        n_matches = len(match_keys)
+
+    if not unique:
+        # a pair counts from the first rank it shows up at
+        order = np.lexsort((rank, keys))
+        keys, rank = keys[order], rank[order]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = keys[1:] != keys[:-1]
+        keys, rank = keys[first], rank[first]
+
+    # a hash lookup beats a binary search of the (few) matches per pair
+    is_match = pd.Series(keys, copy=False).isin(match_keys).to_numpy()
+
+    n_cands = np.bincount(rank, minlength=n_ranks)[:n_ranks].cumsum()
+    tp = np.bincount(rank[is_match], minlength=n_ranks)[:n_ranks].cumsum()
+    precisions = np.concatenate([[1.0], tp / np.maximum(n_cands, 1)])
+    recalls = np.concatenate([[0.0], tp / n_matches])
+    precisions[1:][n_cands == 0] = 1.0
+
+    return RankCurve(precisions, recalls)
+
+
+def evaluate_ranks(
+    rank: np.ndarray,
+    keys: np.ndarray,
+    match_keys: np.ndarray,
+    n_ranks: int,
+    *,
+    n_matches: Optional[int] = None,
+    unique: bool = False,
+    threshold: float = 0.9,
+) -> dict:
+    """``evaluate`` on the arrays of ``curve_from_ranks``."""
+    curve = curve_from_ranks(
+        rank, keys, match_keys, n_ranks, n_matches=n_matches, unique=unique
+    )
+    return curve.metrics(threshold=threshold)
+
+
+def rank_curve(
+    candidates: list[set[tuple[Any, Any]]],
+    matches: Union[set[tuple[Any, Any]], GroundTruth],
+) -> RankCurve:
+    """
+    Precision and recall by rank of ``candidates``, a ``list[set[tuple]]`` by
+    rank or anything with the ``rank``/``left``/``right`` position arrays and
+    ``left_index``/``right_index`` of a ``CandidateSet``, given ``matches``, a
+    set of id tuples or a ``GroundTruth``.
+    """
+    if hasattr(candidates, "rank"):
+        # blocker output holds every pair once, at the rank it was first found
+        rank, left, right = candidates.rank, candidates.left, candidates.right
+        left_index, right_index = candidates.left_index, candidates.right_index
+        unique = True
+    else:
+        pairs = [(p, i) for i, cands in enumerate(candidates) for p in cands]
+        rank = np.array([i for _, i in pairs], dtype=np.int64)
+        left, left_index = pd.factorize(np.array([p[0] for p, _ in pairs]))
+        right, right_index = pd.factorize(np.array([p[1] for p, _ in pairs]))
+        unique = False
+
+    n_right = max(len(right_index), 1)
+    if isinstance(matches, GroundTruth):
+        match_keys = matches.encode(pd.Index(left_index), pd.Index(right_index))
+    else:
+        # encode the matches with the same positions, dropping those never blocked
+        matches = list(matches)
+        match_left = pd.Index(left_index).get_indexer([m[0] for m in matches])
+        match_right = pd.Index(right_index).get_indexer([m[1] for m in matches])
+        found = (match_left >= 0) & (match_right >= 0)
+        match_keys = match_left[found].astype(np.int64) * n_right + match_right[found]
+
+    return curve_from_ranks(
+        rank,
+        np.asarray(left, dtype=np.int64) * n_right + right,
+        match_keys,
+        len(candidates),
+        n_matches=len(matches),
+        unique=unique,
+    )
+
+
 def evaluate(
     candidates: list[set[tuple[Any, Any]]],
-    matches: set[tuple[Any, Any]],
+    matches: Union[set[tuple[Any, Any]], GroundTruth],
     *,
     threshold: float = 0.9,
 ) -> dict:
-    cands = set()
-    precisions, recalls = [1], [0]
-
-    for i in range(len(candidates)):
-        cands = cands | candidates[i]
-
-        tp = len(cands & matches)
-        precision = tp / len(cands)
-        recall = tp / len(matches)
-
-        precisions.append(precision)
-        recalls.append(recall)
-
-    k = 0
-    for i in range(len(candidates) + 1):
-        precision = precisions[i]
-        recall = recalls[i]
-        k = i
-        if recall > threshold:
-            break
-
-    average_precision = auc(recalls, precisions)
-
-    return {
-        "AP": average_precision,
-        "PC": recall,
-        "PQ": precision,
-        "F1": 2 * (precision * recall) / (precision + recall),
-        "K": float(k),
-    }
+    """
+    Compute AP over the recall/precision curve of growing ``k`` and PC/PQ/F1 at
+    the first ``k`` whose recall exceeds ``threshold``, see ``rank_curve``.
+    """
+    return rank_curve(candidates, matches).metrics(threshold=threshold)
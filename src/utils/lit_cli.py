@@ -3,7 +3,11 @@ from typing import Iterable
 
 from lightning.pytorch.cli import LightningCLI
 
+# the subclasses the configs name and the lightning patches, which the src package
+# leaves to be imported on use
+from src import callbacks, datamodules, models  # noqa: F401
 from src.callbacks.evaluator import empty_dataloader, empty_fun
+from src.utils import loggers  # noqa: F401
 
 
 class LitCLI(LightningCLI):
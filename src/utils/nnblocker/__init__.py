@@ -1,15 +1,44 @@
-from .indexers import FaissIndexer, LuceneIndexer, NMSLIBIndexer, SklearnIndexer
-from .nnblocker import NNBlocker
-from .vectorizers import DenseVectorizer, SparseVectorizer
+from . import indexers, vectorizers
+from .autotune import autotune
+from .candidates import CandidateSet
 from .converters import SparseConverter
+from .incremental import IncrementalNNBlocker
+from .indexers import (
+    BM25Indexer,
+    BruteForceIndexer,
+    ShardedIndexer,
+    SklearnIndexer,
+    SparseCosineIndexer,
+)
+from .nnblocker import NNBlocker
+from .stats import BlockingStats
+from .vectorizers import SparseVectorizer
 
 __all__ = [
     "NNBlocker",
+    "IncrementalNNBlocker",
+    "CandidateSet",
+    "BlockingStats",
+    "autotune",
     "SparseVectorizer",
     "SparseConverter",
     "DenseVectorizer",
     "FaissIndexer",
+    "BinaryIndexer",
+    "BM25Indexer",
+    "BruteForceIndexer",
     "LuceneIndexer",
     "NMSLIBIndexer",
+    "ShardedIndexer",
     "SklearnIndexer",
+    "SparseCosineIndexer",
 ]
+
+
+def __getattr__(name: str):
+    # imported on use, see the indexers and vectorizers packages
+    if name in indexers._LAZY:
+        return getattr(indexers, name)
+    if name == "DenseVectorizer":
+        return vectorizers.DenseVectorizer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,128 @@
+import itertools
+import json
+import time
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional, Union
+
+import numpy as np
+
+from src.utils import chunks
+
+from .indexers import Indexer
+from .indexers.indexer import pad_results
+from .nnblocker import take_vectors
+
+
+class TuningPoint(NamedTuple):
+    params: dict
+    recall: float
+    qps: float
+    build_time: float
+    index_bytes: Optional[int]
+
+
+class TuningResult(NamedTuple):
+    best: TuningPoint
+    frontier: list[TuningPoint]
+
+
+def _search(indexer: Indexer, queries, k: int, batch_size: int) -> np.ndarray:
+    indices = [
+        pad_results(*indexer.batch_search(batch, k=k), k)[1]
+        for batch in chunks(queries, batch_size)
+    ]
+    return np.concatenate(indices)
+
+
+def recall_at_k(indices: np.ndarray, truth: np.ndarray) -> float:
+    """Mean fraction of the exact neighbors ``truth`` found in ``indices``."""
+    hits, total = 0, 0
+    for found, exact in zip(indices, truth):
+        exact = exact[exact >= 0]
+        hits += len(np.intersect1d(found[found >= 0], exact))
+        total += len(exact)
+    return hits / total if total else 1.0
+
+
+def pareto_frontier(points: list[TuningPoint]) -> list[TuningPoint]:
+    """The points no other point beats on both recall and QPS, by rising recall."""
+    frontier = []
+    for p in sorted(points, key=lambda p: (-p.qps, -p.recall)):
+        if not frontier or p.recall > frontier[-1].recall:
+            frontier.append(p)
+    return frontier
+
+
+def autotune(
+    make_indexer: Callable[..., Indexer],
+    data,
+    exact: Indexer,
+    *,
+    build_grid: dict[str, list] = {},
+    search_grid: dict[str, list] = {},
+    queries=None,
+    n_queries: int = 1000,
+    k: int = 100,
+    target_recall: float = 0.95,
+    batch_size: int = 128,
+    frontier_path: Optional[Union[str, Path]] = None,
+    seed: int = 0,
+) -> TuningResult:
+    """
+    Build ``make_indexer(**build_params)`` on ``data`` for every combination of
+    ``build_grid`` (e.g. ``nlist``, ``M``) and search a sample of ``n_queries``
+    queries (rows held out of ``data`` by default) with every combination of
+    ``search_grid`` (e.g. ``nprobe``, ``efSearch``), measuring recall@k against
+    ``exact``, queries per second and the index size.
+
+    The best point is the fastest one reaching ``target_recall``, or the most
+    accurate one if none does. The QPS/recall Pareto frontier is returned and,
+    with ``frontier_path``, written there as JSON lines.
+    """
+    rng = np.random.default_rng(seed)
+    source = data if queries is None else queries
+    n = source.shape[0] if hasattr(source, "shape") else len(source)
+    sample = np.sort(rng.choice(n, size=min(n_queries, n), replace=False))
+    queries = take_vectors(source, sample)
+    if source is data:
+        # a query left in the data finds itself at rank 0 with any index
+        data = take_vectors(data, np.setdiff1d(np.arange(n), sample))
+
+    exact.build_index(data)
+    truth = _search(exact, queries, k, batch_size)
+
+    points = []
+    for build_values in itertools.product(*build_grid.values()):
+        build_params = dict(zip(build_grid, build_values))
+        indexer = make_indexer(**build_params)
+        start = time.perf_counter()
+        indexer.build_index(data)
+        build_time = time.perf_counter() - start
+
+        for search_values in itertools.product(*search_grid.values()):
+            search_params = dict(zip(search_grid, search_values))
+            if search_params:
+                indexer.set_search_params(**search_params)
+            start = time.perf_counter()
+            indices = _search(indexer, queries, k, batch_size)
+            qps = len(sample) / (time.perf_counter() - start)
+            points.append(
+                TuningPoint(
+                    {**build_params, **search_params},
+                    recall_at_k(indices, truth),
+                    qps,
+                    build_time,
+                    indexer.index_nbytes,
+                )
+            )
+
+    frontier = pareto_frontier(points)
+    reached = [p for p in frontier if p.recall >= target_recall]
+    best = reached[0] if reached else frontier[-1]
+
+    if frontier_path is not None:
+        with Path(frontier_path).open("w") as f:
+            for p in frontier:
+                f.write(json.dumps(p._asdict()) + "\n")
+
+    return TuningResult(best, frontier)
@@ -0,0 +1,176 @@
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+class CandidateSet:
+    """
+    Blocking candidates stored as parallel arrays.
+
+    ``left`` and ``right`` are positions into ``left_index`` and ``right_index``
+    (the external ids), ``rank`` is the neighbor rank a pair was first found at and
+    ``score`` the indexer score for it. Indexing and iterating give the per-rank
+    ``set[tuple]`` views of the legacy ``list[set[tuple]]`` result, built lazily.
+    """
+
+    def __init__(
+        self,
+        left: np.ndarray,
+        right: np.ndarray,
+        rank: np.ndarray,
+        score: np.ndarray,
+        left_index: pd.Index,
+        right_index: pd.Index,
+        n_ranks: Optional[int] = None,
+    ):
+        self.left = np.asarray(left, dtype=np.int64)
+        self.right = np.asarray(right, dtype=np.int64)
+        self.rank = np.asarray(rank, dtype=np.int32)
+        self.score = np.asarray(score, dtype=np.float32)
+        self.left_index = pd.Index(left_index)
+        self.right_index = pd.Index(right_index)
+        if n_ranks is None:
+            n_ranks = int(self.rank.max()) + 1 if len(self.rank) else 0
+        self.n_ranks = n_ranks
+
+        self._order = None
+        self._bounds = None
+
+    @classmethod
+    def from_ids(
+        cls,
+        left_ids,
+        right_ids,
+        rank,
+        score=None,
+        n_ranks: Optional[int] = None,
+    ) -> "CandidateSet":
+        left, left_index = pd.factorize(np.asarray(left_ids))
+        right, right_index = pd.factorize(np.asarray(right_ids))
+        if score is None:
+            score = np.full(len(left), np.nan, dtype=np.float32)
+        return cls(left, right, rank, score, left_index, right_index, n_ranks)
+
+    @classmethod
+    def from_sets(cls, candidates: list[set[tuple]]) -> "CandidateSet":
+        # keep each pair at the first rank it shows up at
+        pairs = {}
+        for i, cands in enumerate(candidates):
+            for p in cands:
+                pairs.setdefault(p, i)
+        pairs = list(pairs.items())
+        left_ids = [p[0] for p, _ in pairs]
+        right_ids = [p[1] for p, _ in pairs]
+        rank = [i for _, i in pairs]
+        return cls.from_ids(left_ids, right_ids, rank, n_ranks=len(candidates))
+
+    @classmethod
+    def concat(cls, parts: list["CandidateSet"]) -> "CandidateSet":
+        """Concatenate candidate sets that index the same tables."""
+        return cls(
+            np.concatenate([p.left for p in parts]),
+            np.concatenate([p.right for p in parts]),
+            np.concatenate([p.rank for p in parts]),
+            np.concatenate([p.score for p in parts]),
+            parts[0].left_index,
+            parts[0].right_index,
+            max(p.n_ranks for p in parts),
+        )
+
+    @property
+    def left_ids(self) -> np.ndarray:
+        return self.left_index.to_numpy()[self.left]
+
+    @property
+    def right_ids(self) -> np.ndarray:
+        return self.right_index.to_numpy()[self.right]
+
+    @property
+    def n_pairs(self) -> int:
+        return len(self.left)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.left, self.right, self.rank, self.score))
+
+    def __len__(self) -> int:
+        return self.n_ranks
+
+    def __getitem__(self, i: int) -> set[tuple]:
+        if i < 0:
+            i += self.n_ranks
+        if not 0 <= i < self.n_ranks:
+            raise IndexError("rank out of range")
+
+        if self._bounds is None:
+            self._order = np.argsort(self.rank, kind="stable")
+            self._bounds = np.searchsorted(
+                self.rank[self._order], np.arange(self.n_ranks + 1)
+            )
+        sel = self._order[self._bounds[i] : self._bounds[i + 1]]
+        left = self.left_index.to_numpy()[self.left[sel]]
+        right = self.right_index.to_numpy()[self.right[sel]]
+        return set(zip(left.tolist(), right.tolist()))
+
+    def __iter__(self) -> Iterator[set[tuple]]:
+        for i in range(self.n_ranks):
+            yield self[i]
+
+    def to_sets(self) -> list[set[tuple]]:
+        return list(self)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "left": self.left_ids,
+                "right": self.right_ids,
+                "rank": self.rank,
+                "score": self.score,
+            }
+        )
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Save to ``.parquet`` (ids are written out) or ``.npz`` (positions)."""
+        path = Path(path)
+        if path.suffix == ".parquet":
+            # in the schema metadata, as pandas < 2.1 does not write df.attrs
+            table = pa.Table.from_pandas(self.to_frame(), preserve_index=False)
+            metadata = {**table.schema.metadata, b"n_ranks": str(self.n_ranks)}
+            pq.write_table(table.replace_schema_metadata(metadata), path)
+        else:
+            np.savez(
+                path,
+                left=self.left,
+                right=self.right,
+                rank=self.rank,
+                score=self.score,
+                left_index=self.left_index.to_numpy(),
+                right_index=self.right_index.to_numpy(),
+                n_ranks=self.n_ranks,
+            )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "CandidateSet":
+        path = Path(path)
+        if path.suffix == ".parquet":
+            df = pd.read_parquet(path)
+            n_ranks = (pq.read_schema(path).metadata or {}).get(b"n_ranks")
+            n_ranks = int(n_ranks) if n_ranks is not None else None
+            return cls.from_ids(
+                df["left"], df["right"], df["rank"], df["score"], n_ranks
+            )
+        else:
+            with np.load(path, allow_pickle=True) as f:
+                return cls(
+                    f["left"],
+                    f["right"],
+                    f["rank"],
+                    f["score"],
+                    f["left_index"],
+                    f["right_index"],
+                    int(f["n_ranks"]),
+                )
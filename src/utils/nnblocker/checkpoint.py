@@ -0,0 +1,49 @@
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse as sp
+
+# Every file is written under a temporary name and renamed once complete, so an
+# interrupted job never leaves behind something that looks like a finished stage.
+
+
+def save_vectors(stem: Path, vectors) -> None:
+    """Save a vectorizer output next to ``stem`` with a suffix for its type."""
+    if isinstance(vectors, np.ndarray):
+        path = stem.with_suffix(".npy")
+        with path.with_suffix(".tmp").open("wb") as f:
+            np.save(f, vectors)
+    elif sp.issparse(vectors):
+        path = stem.with_suffix(".npz")
+        with path.with_suffix(".tmp").open("wb") as f:
+            sp.save_npz(f, vectors.tocsr())
+    else:
+        path = stem.with_suffix(".pkl")
+        with path.with_suffix(".tmp").open("wb") as f:
+            pickle.dump(vectors, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path.with_suffix(".tmp"), path)
+
+
+def load_vectors(stem: Path):
+    """Load what ``save_vectors`` saved for ``stem``, or None if it is missing."""
+    if stem.with_suffix(".npy").exists():
+        return np.load(stem.with_suffix(".npy"), mmap_mode="r")
+    if stem.with_suffix(".npz").exists():
+        return sp.load_npz(stem.with_suffix(".npz"))
+    if stem.with_suffix(".pkl").exists():
+        with stem.with_suffix(".pkl").open("rb") as f:
+            return pickle.load(f)
+    return None
+
+
+def save_results(path: Path, scores: np.ndarray, indices: np.ndarray) -> None:
+    with path.with_suffix(".tmp").open("wb") as f:
+        np.savez(f, scores=scores, indices=indices)
+    os.replace(path.with_suffix(".tmp"), path)
+
+
+def load_results(path: Path) -> tuple[np.ndarray, np.ndarray]:
+    with np.load(path) as f:
+        return f["scores"], f["indices"]
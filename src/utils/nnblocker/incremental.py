@@ -0,0 +1,355 @@
+import copy
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from .candidates import CandidateSet
+from .indexers import Indexer
+from .nnblocker import (
+    NNBlocker,
+    concat_vectors,
+    take_vectors,
+)
+from .stats import BlockingStats
+
+
+class _Table:
+    """Vectorized records of one table, addressed by position in the index."""
+
+    def __init__(self, df: pd.DataFrame, vectors):
+        self.ids = df.index.to_numpy()
+        self.vectors = vectors
+        self.alive = np.ones(len(df), dtype=bool)
+        self.positions = pd.Series(np.arange(len(df)), index=df.index)
+        self.indexer: Optional[Indexer] = None
+
+    @property
+    def n_dead(self) -> int:
+        return len(self.alive) - int(self.alive.sum())
+
+    def remove(self, ids: Iterable) -> np.ndarray:
+        ids = self.positions.index.intersection(pd.Index(ids))
+        positions = self.positions[ids].to_numpy()
+        self.alive[positions] = False
+        self.positions = self.positions.drop(ids)
+        return positions
+
+    def append(self, ids: pd.Index, vectors) -> np.ndarray:
+        positions = np.arange(len(self.ids), len(self.ids) + len(ids))
+        self.ids = np.concatenate([self.ids, ids.to_numpy()])
+        self.vectors = concat_vectors([self.vectors, vectors])
+        self.alive = np.concatenate([self.alive, np.ones(len(ids), dtype=bool)])
+        self.positions = pd.concat([self.positions, pd.Series(positions, index=ids)])
+
+        if self.indexer is not None:
+            try:
+                self.indexer.add_items(vectors)
+            except NotImplementedError:
+                self.indexer.build_index(self.vectors)
+        return positions
+
+    def compact(self) -> np.ndarray:
+        keep = np.flatnonzero(self.alive)
+        self.ids = self.ids[keep]
+        self.vectors = take_vectors(self.vectors, keep)
+        self.alive = np.ones(len(keep), dtype=bool)
+        self.positions = pd.Series(np.arange(len(keep)), index=self.ids)
+        if self.indexer is not None:
+            self.indexer.build_index(self.vectors)
+        return keep
+
+
+def _ranks(indices: np.ndarray, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Rank of ``right`` in the results of query ``left``, -1 where it is absent."""
+    hits = indices[left] == right[:, None]
+    return np.where(hits.any(axis=1), hits.argmax(axis=1), -1)
+
+
+class IncrementalNNBlocker(NNBlocker):
+    """
+    NNBlocker that keeps the vectorized tables, the built index and the top-k of
+    every query between calls, so that changed records can be blocked without
+    re-encoding or rebuilding.
+
+    Removed and replaced records are tombstoned and filtered out of the search
+    results; once more than ``compact_ratio`` of a table is dead it is compacted
+    and its index rebuilt. Indexers without ``add_items`` are rebuilt on insert.
+    """
+
+    def __init__(
+        self,
+        dfs: list[pd.DataFrame],
+        vectorizer: Callable,
+        indexer: Indexer,
+        compact_ratio: float = 0.25,
+    ) -> None:
+        super().__init__(dfs, vectorizer, indexer)
+        self.compact_ratio = compact_ratio
+
+    def __call__(
+        self,
+        batch_size: int = 128,
+        k: int = 100,
+    ) -> CandidateSet:
+        self.stats = BlockingStats()
+        with self.stats.stage("convert", rows=sum(len(df) for df in self.dfs)):
+            data = self.vectorizer(self.dfs[-1])
+            self._data = _Table(self.dfs[-1], data)
+            if self.self_join:
+                self._queries = self._data
+            else:
+                self._queries = _Table(self.dfs[0], self.vectorizer(self.dfs[0]))
+
+        with self.stats.stage("index", rows=len(self.dfs[-1])):
+            self.indexer.build_index(data)
+        self._data.indexer = self.indexer
+        self.stats.index_bytes = self.indexer.index_nbytes
+
+        with self.stats.stage("query", queries=len(self.dfs[0])):
+            scores, indices = self.search(
+                self._queries.vectors, batch_size=batch_size, k=k
+            )
+        with self.stats.stage("assemble", queries=len(self.dfs[0])):
+            candidates = self.assemble(scores, indices)
+        self.stats.n_candidates = candidates.n_pairs
+        self._k = k
+        self._scores, self._indices = scores, indices
+
+        return candidates
+
+    def update(
+        self,
+        upserts: Optional[pd.DataFrame] = None,
+        deletes: Iterable = (),
+        *,
+        table: int = -1,
+        batch_size: int = 128,
+    ) -> tuple[CandidateSet, CandidateSet]:
+        """
+        Apply inserted or updated records ``upserts`` and deleted ids ``deletes``
+        to ``dfs[table]`` and return the candidate pairs that were added and those
+        that were removed, as a full rerun would have them with an exact index.
+
+        Queries are searched again if they are upserted, lost one of their top-k
+        data records, or, for upserted data records, score one of them at least
+        as well as their k-th result (found by searching the upserted records
+        against the queries, widened until no other query can qualify).
+        """
+        if not hasattr(self, "_data"):
+            raise RuntimeError("call the blocker once before updating it")
+
+        queries, data = self._queries, self._data
+        target = queries if table == 0 and not self.self_join else data
+        old_scores, old_indices = self._scores.copy(), self._indices.copy()
+
+        removed = target.remove(deletes)
+        if upserts is not None and len(upserts):
+            removed = np.concatenate([removed, target.remove(upserts.index)])
+            vectors = self.vectorizer(upserts)
+            added = target.append(upserts.index, vectors)
+        else:
+            vectors, added = None, np.empty(0, dtype=np.int64)
+
+        # rows of the queries the change reaches, new and removed queries included
+        rows = [np.empty(0, dtype=np.int64)]
+        if target is queries:
+            rows += [removed, added]
+        if target is data:
+            rows.append(np.flatnonzero(np.isin(self._indices, removed).any(axis=1)))
+            if len(added):
+                rows.append(self._reverse_neighbors(vectors, rows, batch_size))
+        rows = np.unique(np.concatenate(rows))
+
+        n_new = len(queries.alive) - len(self._scores)
+        self._scores = np.pad(
+            self._scores, ((0, n_new), (0, 0)), constant_values=np.nan
+        )
+        self._indices = np.pad(self._indices, ((0, n_new), (0, 0)), constant_values=-1)
+        old_scores = np.pad(old_scores, ((0, n_new), (0, 0)), constant_values=np.nan)
+        old_indices = np.pad(old_indices, ((0, n_new), (0, 0)), constant_values=-1)
+
+        alive = rows[queries.alive[rows]]
+        self._scores[rows], self._indices[rows] = np.nan, -1
+        self._scores[alive], self._indices[alive] = self._search_alive(
+            take_vectors(queries.vectors, alive), data, batch_size, self._k
+        )
+
+        added, removed = self._diff(rows, old_scores, old_indices)
+        for t in [data] if self.self_join else [queries, data]:
+            if t.n_dead > self.compact_ratio * len(t.alive):
+                self._compact(t)
+
+        return added, removed
+
+    def _reverse_neighbors(
+        self,
+        vectors,
+        rows: list[np.ndarray],
+        batch_size: int,
+    ) -> np.ndarray:
+        """
+        Positions of the queries that score data ``vectors`` at least as well as
+        their k-th result, except ``rows`` that are searched again anyway.
+        """
+        queries = self._queries
+        if queries.indexer is None:
+            # search the query table from the data side, built on first use
+            queries.indexer = copy.copy(self.indexer)
+            queries.indexer.build_index(queries.vectors)
+
+        sign = 1 if self.indexer.higher_is_better else -1
+        # a query with fewer than k results takes any record
+        kth = np.nan_to_num(sign * self._scores[:, -1], nan=-np.inf)
+        kth = np.pad(kth, (0, len(queries.alive) - len(kth)), constant_values=np.inf)
+        kth[np.concatenate(rows)] = np.inf
+        n_alive = int(queries.alive.sum())
+        worst = kth[queries.alive].min() if n_alive else np.inf
+
+        found = [np.empty(0, dtype=np.int64)]
+        pending = np.arange(vectors.shape[0])
+        n = min(self._k, n_alive)
+        while len(pending) and n > 0:
+            scores, indices = self._search_alive(
+                take_vectors(vectors, pending), queries, batch_size, n
+            )
+            scores = sign * scores
+            valid = indices >= 0
+            hits = valid.copy()
+            hits[valid] = scores[valid] >= kth[indices[valid]]
+            found.append(indices[hits])
+            if n == n_alive:
+                break
+            # queries past the n-th result may qualify while it reaches the worst
+            # k-th score of all queries
+            pending = pending[valid[:, -1] & (scores[:, -1] >= worst)]
+            n = min(2 * n, n_alive)
+        return np.unique(np.concatenate(found))
+
+    def _pairs(
+        self,
+        rows: np.ndarray,
+        scores: np.ndarray,
+        indices: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (left, right, rank, score) of the pairs of query ``rows`` that ``scores``
+        and ``indices`` hold, each at its first rank over both queries in dirty ER.
+        """
+        left = np.repeat(rows, self._k)
+        right = indices[rows].ravel()
+        mask = right >= 0
+        left, right = left[mask], right[mask]
+        if self.self_join:
+            left, right = np.minimum(left, right), np.maximum(left, right)
+            mask = left != right
+            left, right = left[mask], right[mask]
+        else:
+            # like NNBlocker.assemble, records with the same id are not paired
+            mask = self._queries.ids[left] != self._data.ids[right]
+            left, right = left[mask], right[mask]
+        keys = np.unique(left * len(self._data.ids) + right)
+        left, right = keys // len(self._data.ids), keys % len(self._data.ids)
+
+        rank, query = _ranks(indices, left, right), left
+        if self.self_join:
+            back = _ranks(indices, right, left)
+            use = (back >= 0) & ((rank < 0) | (back < rank))
+            rank, query = np.where(use, back, rank), np.where(use, right, left)
+        score = scores[query, np.maximum(rank, 0)]
+        return left, right, rank, score
+
+    def _diff(
+        self,
+        rows: np.ndarray,
+        old_scores: np.ndarray,
+        old_indices: np.ndarray,
+    ) -> tuple[CandidateSet, CandidateSet]:
+        """Candidate sets of the pairs of ``rows`` gained and lost by the update."""
+        parts = []
+        for before, after in [
+            (old_indices, (self._scores, self._indices)),
+            (self._indices, (old_scores, old_indices)),
+        ]:
+            left, right, rank, score = self._pairs(rows, *after)
+            if self.self_join:
+                # a pair was there if it was in the results of either record
+                prev_rank = np.maximum(
+                    _ranks(before, left, right), _ranks(before, right, left)
+                )
+            else:
+                prev_rank = _ranks(before, left, right)
+            mask = prev_rank < 0
+            parts.append((left[mask], right[mask], rank[mask], score[mask]))
+
+        # the pairs a replaced record keeps are lost at its old position and gained
+        # at its new one, but unchanged by id
+        keys = [self._id_keys(left, right) for left, right, _, _ in parts]
+        kept = np.intersect1d(*keys)
+        results = []
+        for (left, right, rank, score), key in zip(parts, keys):
+            mask = ~np.isin(key, kept)
+            left, right, rank, score = left[mask], right[mask], rank[mask], score[mask]
+            order = np.lexsort((left, rank))
+            results.append(
+                CandidateSet(
+                    left[order],
+                    right[order],
+                    rank[order],
+                    score[order],
+                    self._queries.ids,
+                    self._data.ids,
+                    self._k,
+                )
+            )
+        return results[0], results[1]
+
+    def _id_keys(self, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+        """Keys of pairs that are equal for pairs of the same ids."""
+
+        def current(table: _Table, positions: np.ndarray) -> np.ndarray:
+            # the live position of the id, if it has one
+            live = table.positions.reindex(table.ids[positions]).to_numpy()
+            return np.where(np.isnan(live), positions, live).astype(np.int64)
+
+        left, right = current(self._queries, left), current(self._data, right)
+        if self.self_join:
+            left, right = np.minimum(left, right), np.maximum(left, right)
+        return left * len(self._data.ids) + right
+
+    def _compact(self, table: _Table) -> None:
+        """Compact ``table`` and remap the kept top-k to its new positions."""
+        # the last entry maps the -1 of missing results to itself
+        remap = np.full(len(table.alive) + 1, -1, dtype=np.int64)
+        keep = table.compact()
+        remap[keep] = np.arange(len(keep))
+        if table is self._queries:
+            self._scores, self._indices = self._scores[keep], self._indices[keep]
+        if table is self._data:
+            self._indices = remap[self._indices]
+
+    def _search_alive(
+        self,
+        queries,
+        table: _Table,
+        batch_size: int,
+        k: int,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Search ``table`` for the ``k`` nearest records that are not tombstoned."""
+        n = min(k + table.n_dead, len(table.alive))
+        scores, indices = self.search(
+            queries, batch_size=batch_size, k=n, indexer=table.indexer
+        )
+        valid = indices >= 0
+        valid[valid] = table.alive[indices[valid]]
+        order = np.argsort(~valid, axis=1, kind="stable")[:, :k]
+        scores = np.take_along_axis(scores, order, axis=1)
+        indices = np.take_along_axis(indices, order, axis=1)
+        valid = np.take_along_axis(valid, order, axis=1)
+        scores[~valid], indices[~valid] = np.nan, -1
+
+        if indices.shape[1] < k:
+            pad = k - indices.shape[1]
+            scores = np.pad(scores, ((0, 0), (0, pad)), constant_values=np.nan)
+            indices = np.pad(indices, ((0, 0), (0, pad)), constant_values=-1)
+        return scores, indices
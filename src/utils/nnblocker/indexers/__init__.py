@@ -1,13 +1,36 @@
-from .faiss_indexer import FaissIndexer
+import importlib
+
+from .bm25_indexer import BM25Indexer
+from .brute_force_indexer import BruteForceIndexer
 from .indexer import Indexer
-from .lucene_indexer import LuceneIndexer
-from .nmslib_indexer import NMSLIBIndexer
+from .sharded_indexer import ShardedIndexer
 from .sklearn_indexer import SklearnIndexer
+from .sparse_cosine_indexer import SparseCosineIndexer
+
+# indexers on libraries that are slow to import (pyserini starts a JVM), imported
+# on use so that e.g. the pool workers of SparseCosineIndexer do without them
+_LAZY = {
+    "BinaryIndexer": ".binary_indexer",
+    "FaissIndexer": ".faiss_indexer",
+    "LuceneIndexer": ".lucene_indexer",
+    "NMSLIBIndexer": ".nmslib_indexer",
+}
 
 __all__ = [
     "Indexer",
+    "BinaryIndexer",
+    "BM25Indexer",
+    "BruteForceIndexer",
     "FaissIndexer",
     "LuceneIndexer",
     "NMSLIBIndexer",
+    "ShardedIndexer",
     "SklearnIndexer",
+    "SparseCosineIndexer",
 ]
+
+
+def __getattr__(name: str):
+    if name in _LAZY:
+        return getattr(importlib.import_module(_LAZY[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
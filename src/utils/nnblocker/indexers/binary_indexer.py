@@ -0,0 +1,105 @@
+from math import ceil
+from pathlib import Path
+from typing import Literal, Optional
+
+import faiss
+import numpy as np
+
+from .indexer import BatchSearchResult, Indexer, rerank
+
+
+class BinaryIndexer(Indexer):
+    """
+    Index dense embeddings as packed bits, one per dimension, set where the value
+    is above a threshold: zero with ``"sign"``, or the per-dimension median of the
+    indexed data with ``"median"``. The codes are searched by Hamming distance with
+    a faiss binary index (``index_factory`` for ``faiss.index_binary_factory``).
+
+    With ``refine``, ``refine * k`` neighbors are searched and re-ranked by inner
+    product against the float vectors, cosine for the normalized output of
+    ``DenseVectorizer``; without, scores are Hamming distances. The float vectors
+    stay on disk if the indexed data is memory mapped and are not counted in
+    ``index_nbytes`` then.
+    """
+
+    def __init__(
+        self,
+        threshold: Literal["sign", "median"] = "median",
+        refine: Optional[float] = 10,
+        index_factory: str = "BFlat",
+        threads: Optional[int] = None,
+    ):
+        super().__init__()
+        self.threshold = threshold
+        self.refine = refine
+        self.index_factory = index_factory
+        self.threads = threads
+        if threads is not None:
+            faiss.omp_set_num_threads(threads)
+
+    @property
+    def higher_is_better(self) -> bool:
+        return self.refine is not None
+
+    def _binarize(self, data) -> np.ndarray:
+        return np.packbits(np.asarray(data) > self._thresholds, axis=1)
+
+    def build_index(self, data, *, batch_size: int = 100000):
+        if self.threshold == "sign":
+            self._thresholds = np.zeros(data.shape[1], dtype=np.float32)
+        else:
+            self._thresholds = np.median(data, axis=0).astype(np.float32)
+
+        n_bits = 8 * ceil(data.shape[1] / 8)
+        self._indexer = faiss.index_binary_factory(n_bits, self.index_factory)
+        if not self._indexer.is_trained:
+            self._indexer.train(self._binarize(data))
+        self._vectors = None
+        self.add_items(data, batch_size=batch_size)
+
+    @property
+    def index_nbytes(self) -> Optional[int]:
+        nbytes = self._indexer.ntotal * self._indexer.code_size
+        if self.refine is not None and not isinstance(self._vectors, np.memmap):
+            nbytes += self._vectors.nbytes
+        return nbytes
+
+    def add_items(self, data, *, batch_size: int = 100000):
+        for i in range(0, data.shape[0], batch_size):
+            self._indexer.add(self._binarize(data[i : i + batch_size]))
+        if self._vectors is None:
+            self._vectors = data
+        else:
+            self._vectors = np.concatenate([self._vectors, data])
+
+    def set_search_params(self, **params):
+        if "refine" in params:
+            self.refine = params.pop("refine")
+        for name, value in params.items():
+            if name == "efSearch":
+                self._indexer.hnsw.efSearch = value
+            else:
+                # e.g. nprobe of BIVF indexes
+                setattr(self._indexer, name, value)
+
+    def save_index(self, index_dir: str):
+        faiss.write_index_binary(self._indexer, str(Path(index_dir) / "index.bfaiss"))
+        np.save(Path(index_dir) / "thresholds.npy", self._thresholds)
+        np.save(Path(index_dir) / "vectors.npy", self._vectors)
+
+    def load_index(self, index_dir: str):
+        self._indexer = faiss.read_index_binary(str(Path(index_dir) / "index.bfaiss"))
+        self._thresholds = np.load(Path(index_dir) / "thresholds.npy")
+        self._vectors = np.load(Path(index_dir) / "vectors.npy", mmap_mode="r")
+
+    def batch_search(self, queries, k: int = 10) -> BatchSearchResult:
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        if self.refine is None:
+            distances, indices = self._indexer.search(self._binarize(queries), k)
+            scores = distances.astype(np.float32)
+        else:
+            n = ceil(k * self.refine)
+            _, shortlist = self._indexer.search(self._binarize(queries), n)
+            scores, indices = rerank(queries, self._vectors, shortlist, k, True)
+        scores[indices < 0] = np.nan
+        return BatchSearchResult(scores, indices)
@@ -0,0 +1,117 @@
+import itertools
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Literal, Optional
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from .indexer import BatchSearchResult, Indexer
+from .topk import csr_topk
+
+
+class BM25Indexer(Indexer):
+    """
+    BM25 retrieval over the token lists of ``SparseConverter`` without a JVM. The
+    indexed records become a CSR postings matrix of term weights (terms by
+    documents, int32 indices), query batches of term counts are scored against it
+    with a sparse matmul and the top-k is picked per query, ``chunk_size`` queries
+    at a time on a pool of ``threads``.
+
+    Scores follow Lucene's ``BM25Similarity`` with pyserini's ``k1`` and ``b``,
+    up to Lucene's lossy encoding of document lengths. With ``"tfidf"``, terms
+    are weighted like sklearn's ``TfidfTransformer`` and scores are cosine.
+    """
+
+    higher_is_better = True
+
+    def __init__(
+        self,
+        similarity: Literal["bm25", "tfidf"] = "bm25",
+        k1: float = 0.9,
+        b: float = 0.4,
+        chunk_size: int = 1024,
+        threads: Optional[int] = None,
+    ):
+        super().__init__()
+        self.similarity = similarity
+        self.k1 = k1
+        self.b = b
+        self.chunk_size = chunk_size
+        self.threads = threads
+
+    def _counts(self, data) -> sp.csr_matrix:
+        """Term counts of token lists over the vocabulary, unknown terms dropped."""
+        lengths = np.fromiter(map(len, data), dtype=np.int64, count=len(data))
+        tokens = np.fromiter(
+            itertools.chain.from_iterable(data), dtype=object, count=lengths.sum()
+        )
+        rows = np.repeat(np.arange(len(data)), lengths)
+        cols = self._vocab.get_indexer(tokens)
+        known = cols >= 0
+        counts = sp.csr_matrix(
+            (np.ones(known.sum(), dtype=np.float32), (rows[known], cols[known])),
+            shape=(len(data), len(self._vocab)),
+        )
+        counts.sum_duplicates()
+        return counts
+
+    def build_index(self, data):
+        self._vocab = pd.Index(
+            pd.unique(np.fromiter(itertools.chain.from_iterable(data), dtype=object))
+        )
+        tf = self._counts(data)
+        n_docs = tf.shape[0]
+        df = np.bincount(tf.indices, minlength=tf.shape[1])
+
+        if self.similarity == "bm25":
+            self._idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+            lengths = np.asarray(tf.sum(axis=1)).ravel()
+            norms = self.k1 * (1 - self.b + self.b * lengths / (lengths.mean() or 1))
+            norms = np.repeat(norms, np.diff(tf.indptr)).astype(np.float32)
+            tf.data = self._idf[tf.indices] * tf.data / (tf.data + norms)
+        else:
+            self._idf = (np.log((1 + n_docs) / (1 + df)) + 1).astype(np.float32)
+            tf = self._tfidf(tf)
+
+        self._postings = tf.T.tocsr()
+
+    def _tfidf(self, tf: sp.csr_matrix) -> sp.csr_matrix:
+        tf = tf.multiply(self._idf).tocsr()
+        norms = np.sqrt(np.asarray(tf.multiply(tf).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sp.csr_matrix(sp.diags(1 / norms, dtype=np.float32) @ tf)
+
+    @property
+    def index_nbytes(self) -> Optional[int]:
+        postings = self._postings
+        return postings.data.nbytes + postings.indices.nbytes + postings.indptr.nbytes
+
+    def save_index(self, index_dir: str):
+        sp.save_npz(Path(index_dir) / "postings.npz", self._postings)
+        with (Path(index_dir) / "vocab.pkl").open("wb") as f:
+            pickle.dump((self._vocab, self._idf), f, pickle.HIGHEST_PROTOCOL)
+
+    def load_index(self, index_dir: str):
+        self._postings = sp.load_npz(Path(index_dir) / "postings.npz")
+        with (Path(index_dir) / "vocab.pkl").open("rb") as f:
+            self._vocab, self._idf = pickle.load(f)
+
+    def batch_search(self, queries, k: int = 10) -> BatchSearchResult:
+        counts = self._counts(queries)
+        if self.similarity == "tfidf":
+            counts = self._tfidf(counts)
+
+        def search_chunk(start: int) -> tuple[np.ndarray, np.ndarray]:
+            scores = counts[start : start + self.chunk_size] @ self._postings
+            return csr_topk(scores, k)
+
+        starts = range(0, counts.shape[0], self.chunk_size)
+        with ThreadPoolExecutor(self.threads) as executor:
+            results = list(executor.map(search_chunk, starts))
+        if not results:
+            results = [csr_topk(counts, k)]
+        scores, indices = map(np.concatenate, zip(*results))
+        return BatchSearchResult(scores, indices)
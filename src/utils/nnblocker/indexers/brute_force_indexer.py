@@ -0,0 +1,89 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Literal, Optional
+
+import numpy as np
+
+from .indexer import BatchSearchResult, Indexer, pad_results
+from .topk import merge_topk, topk
+
+
+class BruteForceIndexer(Indexer):
+    """
+    Exact search in NumPy: the queries are scored against ``tile_size`` data rows
+    at a time with one matmul, and the top-k of each tile is merged into a running
+    top-k. Tiles run in a pool of ``threads``, so memory stays around ``threads``
+    tiles of scores; the data may be memory mapped. ``metric`` is inner product or
+    squared L2 like faiss reports.
+    """
+
+    def __init__(
+        self,
+        metric: Literal["ip", "l2"] = "ip",
+        tile_size: int = 16384,
+        threads: Optional[int] = None,
+    ):
+        super().__init__()
+        self.metric = metric
+        self.tile_size = tile_size
+        self.threads = threads or os.cpu_count()
+
+    @property
+    def higher_is_better(self) -> bool:
+        return self.metric == "ip"
+
+    def build_index(self, data):
+        self._data = data
+        self._norms = None
+        if self.metric == "l2":
+            self._norms = np.concatenate(
+                [
+                    np.einsum("nd,nd->n", tile, tile)
+                    for tile in self._tiles(data.shape[0])
+                ]
+            )
+
+    def _tiles(self, end: int, start: int = 0):
+        for i in range(start, end, self.tile_size):
+            yield np.asarray(self._data[i : i + self.tile_size], dtype=np.float32)
+
+    @property
+    def index_nbytes(self) -> Optional[int]:
+        # memory-mapped data stays on disk
+        nbytes = 0 if isinstance(self._data, np.memmap) else self._data.nbytes
+        return nbytes + (0 if self._norms is None else self._norms.nbytes)
+
+    def add_items(self, data):
+        self.build_index(np.concatenate([self._data, data]))
+
+    def save_index(self, index_dir: str):
+        np.save(Path(index_dir) / "data.npy", self._data)
+
+    def load_index(self, index_dir: str):
+        self.build_index(np.load(Path(index_dir) / "data.npy", mmap_mode="r"))
+
+    def batch_search(self, queries, k: int = 10) -> BatchSearchResult:
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+
+        def search_tile(start: int) -> tuple[np.ndarray, np.ndarray]:
+            tile = np.asarray(
+                self._data[start : start + self.tile_size], dtype=np.float32
+            )
+            scores = queries @ tile.T
+            if self.metric == "l2":
+                scores *= -2
+                scores += self._norms[start : start + self.tile_size]
+                scores += np.einsum("qd,qd->q", queries, queries)[:, None]
+            scores, indices = topk(scores, k, self.higher_is_better)
+            return scores, indices + start
+
+        scores = np.empty((len(queries), 0), dtype=np.float32)
+        indices = np.empty((len(queries), 0), dtype=np.int64)
+        starts = range(0, self._data.shape[0], self.tile_size)
+        with ThreadPoolExecutor(self.threads) as executor:
+            for t_scores, t_indices in executor.map(search_tile, starts):
+                scores, indices = merge_topk(
+                    [scores, t_scores], [indices, t_indices], k, self.higher_is_better
+                )
+        return BatchSearchResult(*pad_results(scores, indices, k))
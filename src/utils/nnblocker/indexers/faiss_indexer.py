@@ -1,24 +1,42 @@
-from math import log2, sqrt
+import hashlib
+import os
+from math import ceil, log2, sqrt
+from pathlib import Path
 from typing import Optional
 
 import faiss
 import numpy as np
 
-from .indexer import BatchSearchResult, Indexer
+from .indexer import BatchSearchResult, Indexer, rerank
 
 
 class FaissIndexer(Indexer):
+    """
+    Faiss index from ``index_factory``, where ``{nlist}`` is filled in from the data
+    size, with optional exact re-ranking (``refine``) and a ``cache_dir``.
+    """
+
     def __init__(
         self,
         index_factory: Optional[str] = None,
         metric_type: Optional[int] = None,
         device_id: Optional[int] = None,
         threads: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        refine: Optional[float] = None,
+        refine_path: Optional[str] = None,
+        train_size: Optional[int] = None,
     ):
         super().__init__()
         self.index_factory = index_factory
         self.metric_type = metric_type
         self.device_id = device_id
+        self.cache_dir = cache_dir
+        self.refine = refine
+        self.refine_path = refine_path
+        self.train_size = train_size
+        self._mmapped = False
+        self.threads = threads
         if threads is not None:
             faiss.omp_set_num_threads(threads)
 
@@ -26,37 +44,169 @@ class FaissIndexer(Indexer):
         self,
         data,
         *,
-        batch_size: int = 1000,
+        batch_size: int = 100000,
     ):
-        if self.index_factory is None:
+        if isinstance(data, (str, Path)):
+            data = np.load(data, mmap_mode="r")
+
+        index_factory = self.index_factory or "IVF{nlist},Flat"
+        if "{nlist}" in index_factory:
             # ref: https://github.com/facebookresearch/faiss/wiki/Guidelines-to-choose-an-index
-            x_initial = 4 * sqrt(len(data))  # between 4xsqrt(n) and 16xsqrt(n)
+            x_initial = 4 * sqrt(data.shape[0])  # between 4xsqrt(n) and 16xsqrt(n)
             nlist = 2 ** round(log2(x_initial))
-            self.index_factory = f"IVF{nlist},Flat"
+            index_factory = index_factory.format(nlist=nlist)
         else:
             nlist = None
+        if self.refine is not None:
+            self._store_vectors(data)
+
+        self._cache_path = None
+        if self.cache_dir is not None:
+            self._cache_path = self._cache_file(data, index_factory)
+            if self._cache_path.exists():
+                self._load(faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                return
 
         if self.metric_type is None:
-            self._indexer = faiss.index_factory(len(data[0]), self.index_factory)
+            self._indexer = faiss.index_factory(data.shape[1], index_factory)
         else:
             self._indexer = faiss.index_factory(
-                len(data[0]), self.index_factory, self.metric_type
+                data.shape[1], index_factory, self.metric_type
             )
 
         if self.device_id is not None:
             res = faiss.StandardGpuResources()
             self._indexer = faiss.index_cpu_to_gpu(res, self.device_id, self._indexer)
 
+        if not self._indexer.is_trained:
+            self._indexer.train(self._train_sample(data))
         if nlist is not None:
-            self._indexer.nprobe = min(100, nlist)
-            self._indexer.train(data)
+            self.set_search_params(nprobe=min(100, nlist))
 
-        for i in range(0, len(data), batch_size):
-            batch_data = data[i : i + batch_size]
+        self._add(data, batch_size)
+        self._mmapped = False
+
+        if self._cache_path is not None:
+            self._save(self._cache_path)
+            if self.device_id is None:
+                # share the pages of the written index with other runs
+                self._load(faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+
+    def _train_sample(self, data) -> np.ndarray:
+        train_size = self.train_size
+        ivf = faiss.try_extract_index_ivf(self._indexer)
+        if train_size is None and ivf is not None:
+            # faiss warns below 39 points per centroid and caps them at 256
+            train_size = 64 * ivf.nlist
+        if train_size is None or train_size >= data.shape[0]:
+            return np.ascontiguousarray(data, dtype=np.float32)
+
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(data.shape[0], size=train_size, replace=False))
+        return np.ascontiguousarray(data[sample], dtype=np.float32)
+
+    def _add(self, data, batch_size: int):
+        for i in range(0, data.shape[0], batch_size):
+            batch_data = np.ascontiguousarray(data[i : i + batch_size], np.float32)
             self._indexer.add(batch_data)
 
+    def _cache_file(self, data, index_factory: str) -> Path:
+        h = hashlib.blake2b(digest_size=16)
+        # everything the trained and filled index depends on besides the data
+        params = [index_factory, self.metric_type, self.train_size, faiss.__version__]
+        h.update(f"{params}|{data.shape}|{data.dtype}".encode())
+        for i in range(0, data.shape[0], 100000):
+            h.update(memoryview(np.ascontiguousarray(data[i : i + 100000])).cast("B"))
+        Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+        return Path(self.cache_dir) / f"{h.hexdigest()}.faiss"
+
+    def _store_vectors(self, data, *, batch_size: int = 100000):
+        if self.refine_path is None:
+            self._vectors = data
+            return
+
+        path = Path(self.refine_path)
+        vectors = np.lib.format.open_memmap(
+            path.with_suffix(".tmp"), mode="w+", dtype=np.float16, shape=data.shape
+        )
+        for i in range(0, len(data), batch_size):
+            vectors[i : i + batch_size] = data[i : i + batch_size]
+        vectors.flush()
+        del vectors
+        os.replace(path.with_suffix(".tmp"), path)
+        self._vectors = np.load(path, mmap_mode="r")
+
+    def _load(self, io_flags: int = 0):
+        self._indexer = faiss.read_index(str(self._cache_path), io_flags)
+        self._mmapped = io_flags != 0
+        if self.device_id is not None:
+            res = faiss.StandardGpuResources()
+            self._indexer = faiss.index_cpu_to_gpu(res, self.device_id, self._indexer)
+            self._mmapped = False
+
+    @property
+    def higher_is_better(self) -> bool:
+        return self.metric_type == faiss.METRIC_INNER_PRODUCT
+
+    @property
+    def index_nbytes(self) -> Optional[int]:
+        try:
+            nbytes = self._indexer.ntotal * self._indexer.sa_code_size()
+        except RuntimeError:
+            # not every index (e.g. GPU ones) implements standalone codes
+            return None
+        if self.refine is not None and self.refine_path is None:
+            # memory-mapped refine vectors live on disk and are not counted
+            nbytes += self._vectors.nbytes
+        return nbytes
+
+    def add_items(self, data, *, batch_size: int = 100000):
+        if self._mmapped:
+            # a memory-mapped index is read-only, so read it into memory first
+            self._load()
+        if self.refine is not None:
+            self._store_vectors(np.concatenate([self._vectors, data]))
+        self._add(data, batch_size)
+
+    def set_search_params(self, **params):
+        if self.device_id is not None:
+            space = faiss.GpuParameterSpace()
+        else:
+            space = faiss.ParameterSpace()
+        for name, value in params.items():
+            space.set_index_parameter(self._indexer, name, value)
+
+    def _save(self, path: Path):
+        index = self._indexer
+        if self.device_id is not None:
+            index = faiss.index_gpu_to_cpu(index)
+        faiss.write_index(index, str(path.with_suffix(".tmp")))
+        os.replace(path.with_suffix(".tmp"), path)
+
+    def save_index(self, index_dir: str):
+        self._save(Path(index_dir) / "index.faiss")
+        if self.refine is not None and self.refine_path is None:
+            np.save(Path(index_dir) / "refine.npy", self._vectors)
+
+    def load_index(self, index_dir: str):
+        self._indexer = faiss.read_index(str(Path(index_dir) / "index.faiss"))
+        self._mmapped = False
+        if self.device_id is not None:
+            res = faiss.StandardGpuResources()
+            self._indexer = faiss.index_cpu_to_gpu(res, self.device_id, self._indexer)
+        if self.refine is not None:
+            path = self.refine_path or Path(index_dir) / "refine.npy"
+            self._vectors = np.load(path, mmap_mode="r")
+
     def batch_search(self, queries, k: int = 10) -> BatchSearchResult:
         if not queries.flags.c_contiguous:
             queries = np.asarray(queries, order="C")
-        scores, indices = self._indexer.search(queries, k)
-        return BatchSearchResult(scores.tolist(), indices.astype(int).tolist())
+        if self.refine is None:
+            scores, indices = self._indexer.search(queries, k)
+        else:
+            _, shortlist = self._indexer.search(queries, ceil(k * self.refine))
+            scores, indices = rerank(
+                queries, self._vectors, shortlist, k, self.higher_is_better
+            )
+        scores[indices < 0] = np.nan
+        return BatchSearchResult(scores, indices)
@@ -1,24 +1,109 @@
 from abc import ABC, abstractmethod
-from typing import NamedTuple
+from typing import NamedTuple, Optional
+
+import numpy as np
 
 
 class SearchResult(NamedTuple):
-    scores: list[float]
-    indices: list[int]
+    scores: np.ndarray
+    indices: np.ndarray
 
 
 class BatchSearchResult(NamedTuple):
-    batch_scores: list[list[float]]
-    batch_indices: list[list[int]]
+    """(n, k) float32 scores and int64 indices, short rows padded with nan / -1."""
+
+    batch_scores: np.ndarray
+    batch_indices: np.ndarray
+
+
+def pad_results(batch_scores, batch_indices, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Stack per-query results into (n, k) arrays padded with nan / -1. Arrays with
+    k columns pass through without a copy; ragged lists are copied row by row.
+    """
+    if isinstance(batch_indices, np.ndarray) and batch_indices.ndim == 2:
+        scores = np.asarray(batch_scores, dtype=np.float32)[:, :k]
+        indices = batch_indices.astype(np.int64, copy=False)[:, :k]
+        pad = ((0, 0), (0, k - indices.shape[1]))
+        if pad[1][1] == 0:
+            return scores, indices
+        return (
+            np.pad(scores, pad, constant_values=np.nan),
+            np.pad(indices, pad, constant_values=-1),
+        )
+
+    scores = np.full((len(batch_indices), k), np.nan, dtype=np.float32)
+    indices = np.full((len(batch_indices), k), -1, dtype=np.int64)
+    for i, (s_row, i_row) in enumerate(zip(batch_scores, batch_indices)):
+        n = min(len(i_row), k)
+        scores[i, :n] = s_row[:n]
+        indices[i, :n] = i_row[:n]
+    return scores, indices
+
+
+def rerank(
+    queries: np.ndarray,
+    vectors: np.ndarray,
+    shortlist: np.ndarray,
+    k: int,
+    higher_is_better: bool,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Re-rank the (n, m) ``shortlist`` positions into ``vectors`` by exact inner
+    product (``higher_is_better``) or squared L2 to ``queries`` and keep the top k.
+    """
+    valid = shortlist >= 0
+    candidates = vectors[np.where(valid, shortlist, 0).ravel()]
+    candidates = candidates.astype(np.float32).reshape(*shortlist.shape, -1)
+
+    dots = np.einsum("qd,qkd->qk", queries, candidates)
+    if higher_is_better:
+        scores = dots
+        scores[~valid] = -np.inf
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    else:
+        # squared L2 like faiss reports
+        scores = np.einsum("qkd,qkd->qk", candidates, candidates) - 2 * dots
+        scores += np.einsum("qd,qd->q", queries, queries)[:, None]
+        scores[~valid] = np.inf
+        order = np.argsort(scores, axis=1, kind="stable")[:, :k]
+
+    scores = np.take_along_axis(scores, order, axis=1)
+    indices = np.take_along_axis(shortlist, order, axis=1)
+    return scores, indices
 
 
 class Indexer(ABC):
     """Wrapper class for various indexers."""
 
+    # whether a larger score means a nearer neighbor (similarity, not distance)
+    higher_is_better: bool = False
+
     @abstractmethod
     def build_index(self, data):
         ...
 
+    @property
+    def index_nbytes(self) -> Optional[int]:
+        """Approximate memory size of the built index, None if it is unknown."""
+        return None
+
+    def add_items(self, data):
+        """Add ``data`` to the built index, its rows taking the next positions."""
+        raise NotImplementedError(f"{type(self).__name__} can not be updated")
+
+    def save_index(self, index_dir: str):
+        """Save the built index into the existing directory ``index_dir``."""
+        raise NotImplementedError(f"{type(self).__name__} can not be saved")
+
+    def load_index(self, index_dir: str):
+        """Load an index saved by ``save_index`` in place of building one."""
+        raise NotImplementedError(f"{type(self).__name__} can not be loaded")
+
+    def set_search_params(self, **params):
+        """Change query-time parameters (e.g. ``nprobe``) of the built index."""
+        raise NotImplementedError(f"{type(self).__name__} has no search parameters")
+
     def search(self, query, k: int = 10) -> SearchResult:
         batch_scores, batch_indices = self.batch_search([query], k)
         return SearchResult(batch_scores[0], batch_indices[0])
@@ -1,65 +1,229 @@
-import itertools
-import shlex
+import os
+import shutil
 from pathlib import Path
-from runpy import run_module
-from unittest.mock import patch
+from typing import Iterable, Optional
 
+import numpy as np
+import pandas as pd
 from pyserini.analysis import JWhiteSpaceAnalyzer
-from pyserini.search import LuceneSearcher
+from pyserini.index.lucene import IndexReader, LuceneIndexer as PyseriniIndexer
 from pyserini.pyclass import autoclass
+from pyserini.search import LuceneSearcher
 
-from .indexer import BatchSearchResult, Indexer
+from .indexer import BatchSearchResult, Indexer, pad_results
 
 BooleanQuery = autoclass("org.apache.lucene.search.BooleanQuery")
 Integer = autoclass("java.lang.Integer")
+Term = autoclass("org.apache.lucene.index.Term")
+File = autoclass("java.io.File")
+FSDirectory = autoclass("org.apache.lucene.store.FSDirectory")
+IndexWriter = autoclass("org.apache.lucene.index.IndexWriter")
+IndexWriterConfig = autoclass("org.apache.lucene.index.IndexWriterConfig")
 BooleanQuery.setMaxClauseCount(Integer.MAX_VALUE)
 
 
 class LuceneIndexer(Indexer):
+    """BM25 search over a Lucene index of pretokenized records, kept in ``save_dir``."""
+
+    higher_is_better = True
+
     def __init__(
         self,
         save_dir: str,
         index_argv: str = ['--keepStopwords', '--stemmer', 'none', '--pretokenized'],
         threads: int = 1,
+        max_clauses: Optional[int] = None,
     ):
         self.save_dir = Path(save_dir)
         self.index_argv = index_argv
         self.threads = threads
+        self.max_clauses = max_clauses
+        self._n_copies = 0
+
+    def __copy__(self) -> "LuceneIndexer":
+        # a copy keeps its index in a subdirectory of its own, numbered in the
+        # order of copying so that a rerun finds it again
+        self._n_copies += 1
+        return LuceneIndexer(
+            self.save_dir / f"copy{self._n_copies}",
+            self.index_argv,
+            self.threads,
+            self.max_clauses,
+        )
+
+    @property
+    def _index_dir(self) -> Path:
+        return self.save_dir / "lucene"
+
+    @property
+    def _state_path(self) -> Path:
+        return self.save_dir / "docs.pkl"
+
+    def build_index(self, data, *, batch_size: int = 100000):
+        """
+        Feed the token lists to an in-process Lucene ``IndexWriter`` over the JVM
+        bridge, ``batch_size`` documents at a time indexed by ``threads``.
+        """
+        contents = data.apply(" ".join)
+        digests = pd.util.hash_pandas_object(contents, index=False).to_numpy()
+        state = pd.read_pickle(self._state_path) if self._state_path.exists() else {}
+
+        reusable = state.get("index_argv") == list(self.index_argv)
+        if reusable and self._index_dir.exists():
+            # documents of the index whose record and tokens are both unchanged
+            docs = state["docs"]
+            keep = pd.MultiIndex.from_arrays([docs["id"], docs["digest"]]).isin(
+                pd.MultiIndex.from_arrays([data.index, digests])
+            )
+            if keep.sum() < len(data) / 2:
+                state = {}
+        else:
+            state = {}
+
+        self._state_path.unlink(missing_ok=True)
+        if state:
+            self._docs = docs
+            self._next_docid = state["next_docid"]
+            self._delete(docs.index[~keep])
+            kept = pd.Index(data.index).isin(self._docs["id"])
+            new = np.flatnonzero(~kept)
+        else:
+            shutil.rmtree(self._index_dir, ignore_errors=True)
+            self._docs = pd.DataFrame(
+                {
+                    "id": pd.Series([], dtype=data.index.dtype),
+                    "digest": np.empty(0, np.uint64),
+                }
+            )
+            self._next_docid = 0
+            new = np.arange(len(data))
+
+        self._n_rows = len(data)
+        self._positions = pd.Series(np.arange(len(data)), index=data.index)
+        self._add(contents.iloc[new], digests[new], batch_size)
+        self._commit()
 
-    def build_index(self, data):
-        data = data.apply(" ".join)
-        data.reset_index(inplace=True, drop=True)
-        data = data.to_frame("contents")
-        data.index.names = ["id"]
-        data = data.reset_index()
-        data["id"] = data["id"].astype("str")
-        corpus_file = self.save_dir / "corpus.jsonl"
-        data.to_json(corpus_file, orient="records", lines=True, force_ascii=False)
-
-        index_dir = self.save_dir / "lucene"
-        argv = list(
-            itertools.chain(
-                ["pyserini.index.lucene"],
-                ["--collection", "JsonCollection"],
-                ["--input", str(self.save_dir)],
-                ["--index", str(index_dir)],
-                ["--threads", str(self.threads)],
-                self.index_argv,
+    def add_items(self, data, *, batch_size: int = 100000):
+        """Append records to the indexed rows, replacing those with the same id."""
+        contents = data.apply(" ".join)
+        digests = pd.util.hash_pandas_object(contents, index=False).to_numpy()
+        self._state_path.unlink(missing_ok=True)
+        self._delete(self._docs.index[self._docs["id"].isin(data.index)])
+        positions = np.arange(self._n_rows, self._n_rows + len(data))
+        self._n_rows += len(data)
+        self._positions = pd.concat(
+            [
+                self._positions[~self._positions.index.isin(data.index)],
+                pd.Series(positions, index=data.index),
+            ]
+        )
+        self._add(contents, digests, batch_size)
+        self._commit()
+
+    def delete_items(self, ids: Iterable):
+        """Remove the records with the given ids from the index."""
+        ids = pd.Index(ids)
+        self._state_path.unlink(missing_ok=True)
+        self._delete(self._docs.index[self._docs["id"].isin(ids)])
+        self._positions = self._positions[~self._positions.index.isin(ids)]
+        self._commit()
+
+    def _delete(self, docids: pd.Index):
+        if len(docids) == 0:
+            return
+        config = IndexWriterConfig(JWhiteSpaceAnalyzer())
+        directory = FSDirectory.open(File(str(self._index_dir)).toPath())
+        writer = IndexWriter(directory, config)
+        writer.deleteDocuments([Term("id", str(docid)) for docid in docids])
+        writer.commit()
+        writer.close()
+        self._docs = self._docs.drop(docids)
+
+    def _add(self, contents: pd.Series, digests: np.ndarray, batch_size: int):
+        if len(contents) == 0 and self._index_dir.exists():
+            return
+        docids = np.arange(self._next_docid, self._next_docid + len(contents))
+        self._next_docid += len(contents)
+        self._docs = pd.concat(
+            [
+                self._docs,
+                pd.DataFrame({"id": contents.index, "digest": digests}, index=docids),
+            ]
+        )
+
+        # the writer takes anserini's single-dash options
+        argv = [arg[1:] if arg.startswith("--") else arg for arg in self.index_argv]
+        writer = PyseriniIndexer(
+            args=["-index", str(self._index_dir), *argv],
+            append=self._index_dir.exists(),
+            threads=self.threads,
+        )
+        contents = contents.to_list()
+        for start in range(0, len(contents), batch_size):
+            batch = contents[start : start + batch_size]
+            writer.add_batch_dict(
+                [
+                    {"id": str(docid), "contents": c}
+                    for docid, c in zip(docids[start:], batch)
+                ]
             )
+        writer.close()
+
+    def _commit(self):
+        """Save the document table and reopen the index for searching."""
+        tmp_path = self._state_path.with_suffix(".tmp")
+        pd.to_pickle(
+            {
+                "index_argv": list(self.index_argv),
+                "next_docid": self._next_docid,
+                "docs": self._docs,
+            },
+            tmp_path,
         )
-        print(shlex.join(argv))
-        with patch("sys.argv", argv):
-            run_module(argv[0], run_name="__main__")
+        os.replace(tmp_path, self._state_path)
+
+        # Lucene document id to position in the data, -1 for deleted records
+        self._remap = np.full(self._next_docid, -1, dtype=np.int64)
+        positions = self._positions.reindex(self._docs["id"]).fillna(-1)
+        self._remap[self._docs.index] = positions.to_numpy()
 
-        self._searcher = LuceneSearcher(str(index_dir))
+        self._searcher = LuceneSearcher(str(self._index_dir))
         analyzer = JWhiteSpaceAnalyzer()
         self._searcher.set_analyzer(analyzer)
+        self._reader = IndexReader(str(self._index_dir))
+        self._df = {}
+
+    @property
+    def index_nbytes(self) -> Optional[int]:
+        return sum(f.stat().st_size for f in self._index_dir.iterdir())
+
+    def set_search_params(self, max_clauses: Optional[int] = None):
+        self.max_clauses = max_clauses
+
+    def _doc_freq(self, term: str) -> int:
+        if term not in self._df:
+            self._df[term] = self._reader.reader.docFreq(Term("contents", term))
+        return self._df[term]
+
+    def _rarest(self, tokens: list[str]) -> list[str]:
+        terms = list(dict.fromkeys(tokens))
+        if len(terms) <= self.max_clauses:
+            return terms
+        # tokens missing from the index match nothing and would waste clauses
+        terms = [t for t in terms if self._doc_freq(t) > 0]
+        return sorted(terms, key=self._doc_freq)[: self.max_clauses]
 
     def batch_search(self, queries, k: int = 10) -> BatchSearchResult:
+        if self.max_clauses is not None:
+            queries = queries.apply(self._rarest)
         queries = queries.apply(" ".join).to_list()
         query_ids = list(map(str, range(len(queries))))
-        results = self._searcher.batch_search(queries, query_ids, k=k)
+        results = self._searcher.batch_search(
+            queries, query_ids, k=k, threads=self.threads
+        )
         values = [results[str(i)] for i in range(len(queries))]
         scores = [[r.score for r in rl] for rl in values]
         indices = [[int(r.docid) for r in rl] for rl in values]
+        scores, indices = pad_results(scores, indices, k)
+        indices[indices >= 0] = self._remap[indices[indices >= 0]]
         return BatchSearchResult(scores, indices)
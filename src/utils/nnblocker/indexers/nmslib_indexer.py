@@ -1,8 +1,9 @@
+from pathlib import Path
 from typing import Optional
 
 import nmslib
 
-from .indexer import BatchSearchResult, Indexer
+from .indexer import BatchSearchResult, Indexer, pad_results
 
 
 class NMSLIBIndexer(Indexer):
@@ -25,8 +26,21 @@ class NMSLIBIndexer(Indexer):
         self._indexer.createIndex(self.index_params)
         self._indexer.setQueryTimeParams(self.query_params)
 
+    def set_search_params(self, **params):
+        self.query_params = {**self.query_params, **params}
+        self._indexer.setQueryTimeParams(self.query_params)
+
+    def save_index(self, index_dir: str):
+        self._indexer.saveIndex(str(Path(index_dir) / "index.nmslib"), save_data=True)
+
+    def load_index(self, index_dir: str):
+        self._indexer = nmslib.init(**self.init_kwargs)
+        self._indexer.loadIndex(str(Path(index_dir) / "index.nmslib"), load_data=True)
+        self._indexer.setQueryTimeParams(self.query_params)
+
     def batch_search(self, queries, k: int = 10) -> BatchSearchResult:
         results = self._indexer.knnQueryBatch(queries, k=k, num_threads=self.threads)
-        indices = [r[0].tolist() for r in results]
-        scores = [r[1].tolist() for r in results]
-        return BatchSearchResult(scores, indices)
+        # rows can come back with fewer than k neighbors
+        indices = [r[0] for r in results]
+        scores = [r[1] for r in results]
+        return BatchSearchResult(*pad_results(scores, indices, k))
@@ -0,0 +1,164 @@
+import copy
+import multiprocessing as mp
+import os
+import sys
+from typing import Literal
+
+import numpy as np
+
+from src.utils import chunks
+
+from .indexer import BatchSearchResult, Indexer, pad_results
+from .topk import merge_topk
+
+
+def _limit_threads(threads: int) -> None:
+    # the indexers set the OpenMP threads of faiss in __init__, which only ran in
+    # the parent; faiss is imported by now if the unpickled indexer uses it
+    if "faiss" in sys.modules:
+        sys.modules["faiss"].omp_set_num_threads(threads)
+
+
+def _serve(indexer: Indexer, conn, threads: int) -> None:
+    """Worker loop: call ``indexer`` methods (or read properties) on request."""
+    _limit_threads(threads)
+    while True:
+        request = conn.recv()
+        if request is None:
+            break
+        name, args, kwargs = request
+        try:
+            attr = getattr(indexer, name)
+            conn.send((True, attr(*args, **kwargs) if callable(attr) else attr))
+        except Exception as e:
+            conn.send((False, e))
+
+
+class _ShardActor:
+    def __init__(self, indexer: Indexer, threads: int):
+        _limit_threads(threads)
+        self.indexer = indexer
+
+    def call(self, name: str, *args, **kwargs):
+        attr = getattr(self.indexer, name)
+        return attr(*args, **kwargs) if callable(attr) else attr
+
+
+class ShardedIndexer(Indexer):
+    """
+    Split the data into ``n_shards`` contiguous row ranges, each indexed by a
+    copy of ``indexer`` in its own worker (a process, or a Ray actor with
+    ``backend="ray"``). Queries are sent to every shard and the per-shard top-k
+    merged exactly, so memory per worker is bounded by the shard size. Each
+    worker runs on the ``threads`` of ``indexer``, or its share of the cores.
+    """
+
+    def __init__(
+        self,
+        indexer: Indexer,
+        n_shards: int = 4,
+        backend: Literal["process", "ray"] = "process",
+    ):
+        super().__init__()
+        self.indexer = indexer
+        self.n_shards = n_shards
+        self.backend = backend
+        self.higher_is_better = indexer.higher_is_better
+        self._workers = []
+        self._shards = []
+        self._threads = getattr(indexer, "threads", None) or max(
+            1, (os.cpu_count() or 1) // n_shards
+        )
+
+    def __copy__(self) -> "ShardedIndexer":
+        # a copy gets its own workers when it builds, rather than sharing these
+        return ShardedIndexer(copy.copy(self.indexer), self.n_shards, self.backend)
+
+    def _start(self, n_shards: int) -> None:
+        self.close()
+        # one copy of the indexer per shard, kept across builds, so that shards
+        # with state on disk (like LuceneIndexer) do not share it
+        while len(self._shards) < n_shards:
+            self._shards.append(copy.copy(self.indexer))
+        if self.backend == "ray":
+            import ray
+
+            actor_class = ray.remote(_ShardActor)
+            self._workers = [
+                actor_class.remote(indexer, self._threads)
+                for indexer in self._shards[:n_shards]
+            ]
+        else:
+            ctx = mp.get_context("spawn")
+            for indexer in self._shards[:n_shards]:
+                conn, child_conn = ctx.Pipe()
+                process = ctx.Process(
+                    target=_serve, args=(indexer, child_conn, self._threads)
+                )
+                process.start()
+                self._workers.append((process, conn))
+
+    def _call(self, name: str, args_per_shard: list[tuple], kwargs: dict = {}) -> list:
+        """Call ``name`` on every shard at once and gather the results in order."""
+        if self.backend == "ray":
+            import ray
+
+            return ray.get(
+                [
+                    w.call.remote(name, *args, **kwargs)
+                    for w, args in zip(self._workers, args_per_shard)
+                ]
+            )
+
+        for (_, conn), args in zip(self._workers, args_per_shard):
+            conn.send((name, args, kwargs))
+        # every reply is read before raising, or it would answer the next call
+        replies = [conn.recv() for _, conn in self._workers]
+        for ok, result in replies:
+            if not ok:
+                raise result
+        return [result for _, result in replies]
+
+    def build_index(self, data):
+        shard_size = -(-data.shape[0] // self.n_shards)
+        shards = list(chunks(data, shard_size))
+        self._offsets = np.cumsum([0] + [s.shape[0] for s in shards])[:-1]
+
+        # small data may fill fewer than n_shards shards
+        self._start(len(shards))
+        self._call("build_index", [(s,) for s in shards])
+
+    @property
+    def index_nbytes(self):
+        sizes = self._call("index_nbytes", [()] * len(self._workers))
+        return None if None in sizes else sum(sizes)
+
+    def set_search_params(self, **params):
+        self._call("set_search_params", [()] * len(self._workers), params)
+
+    def batch_search(self, queries, k: int = 10) -> BatchSearchResult:
+        results = self._call("batch_search", [(queries, k)] * len(self._workers))
+
+        scores, indices = [], []
+        for offset, (b_scores, b_indices) in zip(self._offsets, results):
+            b_scores, b_indices = pad_results(b_scores, b_indices, k)
+            scores.append(b_scores)
+            indices.append(np.where(b_indices >= 0, b_indices + offset, -1))
+        scores, indices = merge_topk(scores, indices, k, self.higher_is_better)
+        return BatchSearchResult(*pad_results(scores, indices, k))
+
+    def close(self) -> None:
+        """Stop the shard workers."""
+        if self.backend == "ray":
+            import ray
+
+            for w in self._workers:
+                ray.kill(w)
+        else:
+            for process, conn in self._workers:
+                conn.send(None)
+                process.join()
+        self._workers = []
+
+    def __del__(self):
+        self.close()
@@ -1,6 +1,12 @@
+import pickle
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import scipy.sparse as sp
 from sklearn.neighbors import NearestNeighbors
 
-from .indexer import BatchSearchResult, Indexer
+from .indexer import BatchSearchResult, Indexer, pad_results
 
 
 class SklearnIndexer(Indexer):
@@ -12,10 +18,35 @@ class SklearnIndexer(Indexer):
         self.init_kwargs = init_kwargs
 
     def build_index(self, data):
+        self._data = data
         self._indexer = NearestNeighbors(**self.init_kwargs)
         self._indexer.fit(data)
 
+    @property
+    def index_nbytes(self) -> Optional[int]:
+        if sp.issparse(self._data):
+            return sum(
+                a.nbytes
+                for a in (self._data.data, self._data.indices, self._data.indptr)
+            )
+        return self._data.nbytes
+
+    def add_items(self, data):
+        if sp.issparse(data):
+            data = sp.vstack([self._data, data], format="csr")
+        else:
+            data = np.concatenate([self._data, data])
+        self.build_index(data)
+
+    def save_index(self, index_dir: str):
+        with (Path(index_dir) / "index.pkl").open("wb") as f:
+            pickle.dump((self._data, self._indexer), f, pickle.HIGHEST_PROTOCOL)
+
+    def load_index(self, index_dir: str):
+        with (Path(index_dir) / "index.pkl").open("rb") as f:
+            self._data, self._indexer = pickle.load(f)
+
     def batch_search(self, queries, k: int = 10) -> BatchSearchResult:
         n_neighbors = min(k, self._indexer.n_samples_fit_)
         distances, indices = self._indexer.kneighbors(queries, n_neighbors=n_neighbors)
-        return BatchSearchResult(distances.tolist(), indices.tolist())
+        return BatchSearchResult(*pad_results(distances, indices, k))
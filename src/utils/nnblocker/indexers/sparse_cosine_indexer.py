@@ -0,0 +1,170 @@
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+from .indexer import BatchSearchResult, Indexer
+from .topk import csr_topk
+
+# postings of the index attached in a pool worker, and the blocks they are in
+_postings = None
+_buffers = None
+_blocks = []
+
+
+def _attach(buffers: list[tuple[str, tuple, str]], shape: tuple) -> None:
+    global _postings, _buffers, _blocks
+    # the arrays over the old blocks go first, or closing them fails
+    _postings = None
+    for block in _blocks:
+        block.close()
+    _buffers = buffers
+    _blocks = [SharedMemory(name=name) for name, _, _ in buffers]
+    data, indices, indptr = (
+        np.ndarray(shape_, dtype=dtype, buffer=block.buf)
+        for (_, shape_, dtype), block in zip(buffers, _blocks)
+    )
+    _postings = sp.csr_matrix((data, indices, indptr), shape=shape, copy=False)
+
+
+def _search_chunk(buffers, shape: tuple, queries, k: int, min_score: float):
+    if buffers != _buffers:
+        # the pool outlives a build, after which the postings are in new blocks
+        _attach(buffers, shape)
+    return _topk_product(queries, _postings, k, min_score)
+
+
+def _topk_product(queries, postings, k: int, min_score: float):
+    scores = queries @ postings
+    if min_score > 0:
+        # prune below min_score before the top-k, like sparse_dot_topn
+        scores.data[scores.data < min_score] = 0
+        scores.eliminate_zeros()
+    return csr_topk(scores, k)
+
+
+class SparseCosineIndexer(Indexer):
+    """
+    Exact cosine top-k over sparse vectors such as the count matrices of
+    ``SparseVectorizer``. Rows are L2-normalized once and the data kept as
+    features-by-records CSR postings, so each chunk of ``chunk_size`` queries is
+    one sparse product whose rows are pruned below ``min_score`` and cut to the
+    top-k. With ``n_jobs`` > 1 the chunks run on a pool of processes that map the
+    postings from shared memory instead of receiving copies. The pool is started
+    once and kept when the index is rebuilt.
+    """
+
+    higher_is_better = True
+
+    def __init__(
+        self,
+        min_score: float = 0.0,
+        chunk_size: int = 1024,
+        n_jobs: Optional[int] = None,
+    ):
+        super().__init__()
+        self.min_score = min_score
+        self.chunk_size = chunk_size
+        self.n_jobs = n_jobs or mp.cpu_count()
+        self._pool = None
+        self._blocks = []
+        self._buffers = None
+
+    def __copy__(self) -> "SparseCosineIndexer":
+        # a copy gets its own pool and shared memory when it builds
+        return SparseCosineIndexer(self.min_score, self.chunk_size, self.n_jobs)
+
+    def build_index(self, data):
+        data = normalize(sp.csr_matrix(data, dtype=np.float32))
+        self._share(data.T.tocsr())
+
+    def _share(self, postings: sp.csr_matrix) -> None:
+        self._unlink()
+        self._postings = postings
+        if self.n_jobs == 1:
+            return
+
+        buffers = []
+        arrays = (postings.data, postings.indices, postings.indptr)
+        for array in arrays:
+            block = SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[:] = array
+            self._blocks.append(block)
+            buffers.append((block.name, array.shape, array.dtype.str))
+        self._buffers = buffers
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                self.n_jobs, mp_context=mp.get_context("spawn")
+            )
+
+    @property
+    def index_nbytes(self) -> Optional[int]:
+        postings = self._postings
+        return postings.data.nbytes + postings.indices.nbytes + postings.indptr.nbytes
+
+    def add_items(self, data):
+        data = normalize(sp.csr_matrix(data, dtype=np.float32))
+        self._share(sp.vstack([self._postings.T, data], format="csr").T.tocsr())
+
+    def set_search_params(self, min_score: float = 0.0):
+        self.min_score = min_score
+
+    def save_index(self, index_dir: str):
+        sp.save_npz(Path(index_dir) / "postings.npz", self._postings)
+
+    def load_index(self, index_dir: str):
+        self._share(sp.load_npz(Path(index_dir) / "postings.npz"))
+
+    def batch_search(self, queries, k: int = 10) -> BatchSearchResult:
+        if queries.shape[0] == 0:
+            return BatchSearchResult(
+                np.empty((0, k), dtype=np.float32), np.empty((0, k), dtype=np.int64)
+            )
+
+        queries = normalize(sp.csr_matrix(queries, dtype=np.float32))
+        if self._pool is None:
+            results = [
+                _topk_product(
+                    queries[i : i + self.chunk_size], self._postings, k, self.min_score
+                )
+                for i in range(0, queries.shape[0], self.chunk_size)
+            ]
+        else:
+            # spread even small batches over the workers
+            chunk_size = min(self.chunk_size, -(-queries.shape[0] // self.n_jobs))
+            futures = [
+                self._pool.submit(
+                    _search_chunk,
+                    self._buffers,
+                    self._postings.shape,
+                    queries[i : i + chunk_size],
+                    k,
+                    self.min_score,
+                )
+                for i in range(0, queries.shape[0], chunk_size)
+            ]
+            results = [f.result() for f in futures]
+
+        scores, indices = map(np.concatenate, zip(*results))
+        return BatchSearchResult(scores, indices)
+
+    def close(self) -> None:
+        """Stop the worker pool and free the shared memory."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        self._unlink()
+
+    def _unlink(self) -> None:
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __del__(self):
+        self.close()
@@ -0,0 +1,68 @@
+from typing import Optional
+
+import numpy as np
+
+
+def topk(
+    scores: np.ndarray,
+    k: int,
+    higher_is_better: bool,
+    indices: Optional[np.ndarray] = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Best ``k`` scores of each row of (n, m) ``scores``, sorted, and their
+    ``indices`` (the column positions by default). nan scores rank last.
+    """
+    k = min(k, scores.shape[1])
+    keys = -scores if higher_is_better else scores.copy()
+    keys[np.isnan(keys)] = np.inf
+
+    if k < scores.shape[1]:
+        part = np.argpartition(keys, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    order = np.take_along_axis(
+        part,
+        np.argsort(np.take_along_axis(keys, part, axis=1), axis=1, kind="stable"),
+        axis=1,
+    )
+
+    if indices is None:
+        indices = order
+    else:
+        indices = np.take_along_axis(indices, order, axis=1)
+    return np.take_along_axis(scores, order, axis=1), indices
+
+
+def merge_topk(
+    scores: list[np.ndarray],
+    indices: list[np.ndarray],
+    k: int,
+    higher_is_better: bool,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Merge per-part top-k results of the same queries into the overall top ``k``."""
+    return topk(np.hstack(scores), k, higher_is_better, np.hstack(indices))
+
+
+def csr_topk(
+    matrix, k: int, higher_is_better: bool = True
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Best ``k`` stored entries of each row of a CSR ``matrix`` and their columns,
+    as (n, k) arrays padded with nan / -1.
+    """
+    scores = np.full((matrix.shape[0], k), np.nan, dtype=np.float32)
+    indices = np.full((matrix.shape[0], k), -1, dtype=np.int64)
+    indptr = matrix.indptr
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(indptr))
+    keys = -matrix.data if higher_is_better else matrix.data.copy()
+    keys[np.isnan(keys)] = np.inf
+
+    # entries sorted by row and then score, so the first k of a row are its best
+    order = np.lexsort((keys, rows))
+    ranks = np.arange(len(order)) - indptr[rows]
+    keep = ranks < k
+    order, rows, ranks = order[keep], rows[keep], ranks[keep]
+    scores[rows, ranks] = matrix.data[order]
+    indices[rows, ranks] = matrix.indices[order]
+    return scores, indices
@@ -1,61 +1,601 @@
-from typing import Callable
+import copy
+import json
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
 
+import numpy as np
 import pandas as pd
-from codetiming import Timer
+import pyarrow as pa
+import pyarrow.parquet as pq
+import scipy.sparse as sp
 
 from src.utils import chunks
 
+from .candidates import CandidateSet
+from .checkpoint import load_results, load_vectors, save_results, save_vectors
 from .indexers import Indexer
+from .indexers.indexer import pad_results
+from .stats import BlockingStats, StageStats
+
+
+def concat_vectors(vectors: list):
+    """Concatenate the vectorizer outputs of several tables row-wise."""
+    if isinstance(vectors[0], pd.Series):
+        return pd.concat(vectors, ignore_index=True)
+    if sp.issparse(vectors[0]):
+        return sp.vstack(vectors, format="csr")
+    return np.concatenate(vectors)
+
+
+def take_vectors(vectors, positions: np.ndarray):
+    """Select rows of a vectorizer output by position."""
+    if isinstance(vectors, pd.Series):
+        return vectors.iloc[positions].reset_index(drop=True)
+    return vectors[positions]
+
+
+def flatten_results(
+    scores: np.ndarray,
+    indices: np.ndarray,
+    offset: int = 0,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Flatten (n_queries, k) search results, whose row ``i`` holds the results of
+    query ``offset + i``, into rank-major (left, right, rank, score) arrays.
+    """
+    n_queries, k = indices.shape
+    left = np.broadcast_to(
+        np.arange(offset, offset + n_queries, dtype=np.int64)[:, None],
+        indices.shape,
+    )
+    rank = np.broadcast_to(np.arange(k, dtype=np.int64), indices.shape)
+    return left.T.ravel(), indices.T.ravel(), rank.T.ravel(), scores.T.ravel()
+
+
+def dedup_pairs(
+    left: np.ndarray,
+    right: np.ndarray,
+    rank: np.ndarray,
+    score: np.ndarray,
+    n_right: int,
+    *,
+    dirty: bool = False,
+    seen: Optional[np.ndarray] = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Drop padding, self pairs (dirty ER only) and repeated pairs from rank-major
+    pair arrays. A pair is only kept at its first occurrence (Comparison
+    Propagation) and if its packed key is not in the sorted array ``seen``.
+    """
+    mask = right >= 0
+    if dirty:
+        left, right = np.minimum(left, right), np.maximum(left, right)
+        mask &= left != right
+    left, right, rank, score = left[mask], right[mask], rank[mask], score[mask]
+
+    keys = left * n_right + right
+    keys, first = np.unique(keys, return_index=True)
+    if seen is not None and len(seen):
+        first = first[~np.isin(keys, seen, assume_unique=True)]
+    first.sort()
+    return left[first], right[first], rank[first], score[first]
+
+
+def _type_name(obj) -> str:
+    cls = obj if callable(obj) and hasattr(obj, "__qualname__") else type(obj)
+    return f"{cls.__module__}.{cls.__qualname__}"
 
 
 class NNBlocker:
+    """
+    Nearest neighbor blocking of ``dfs[0]`` (queries) against ``dfs[-1]`` (data).
+
+    With a ``work_dir``, the data embeddings (in shards of ``shard_size`` rows),
+    the built index and the results of every query chunk are checkpointed there,
+    and a restarted run resumes after the last finished stage or chunk. The work
+    directory belongs to the run configuration recorded in its ``manifest.json``;
+    a run with another configuration is refused rather than resumed.
+
+    Each run leaves a ``BlockingStats`` report of its stages in ``stats``.
+    """
+
     def __init__(
         self,
         dfs: list[pd.DataFrame],
         vectorizer: Callable,
         indexer: Indexer,
+        work_dir: Optional[str] = None,
+        shard_size: int = 100000,
     ) -> None:
         self.dfs = dfs
         self.vectorizer = vectorizer
         self.indexer = indexer
+        self.work_dir = Path(work_dir) if work_dir is not None else None
+        self.shard_size = shard_size
+        self.stats = BlockingStats()
+        if self.work_dir is not None:
+            (self.work_dir / "results").mkdir(parents=True, exist_ok=True)
+
+    @property
+    def self_join(self) -> bool:
+        """Whether queries and data are the same table and share one encoding."""
+        return self.dfs[0] is self.dfs[-1]
 
     def __call__(
         self,
         batch_size: int = 128,
         k: int = 100,
-    ) -> list[set[tuple]]:
-        with Timer(text="Convert time: {milliseconds:.0f} ms"):
-            queries = self.vectorizer(self.dfs[0])
-            data = self.vectorizer(self.dfs[-1])
-        with Timer(text="Index time: {milliseconds:.0f} ms"):
-            self.indexer.build_index(data)
+        chunk_size: Optional[int] = None,
+        prefetch: int = 1,
+    ) -> CandidateSet:
+        """
+        Block the tables. With ``chunk_size`` set, queries are vectorized in chunks
+        of that many rows, up to ``prefetch`` chunks ahead in a background thread,
+        so that encoding overlaps with building the index and searching.
+        """
+        if chunk_size is None and self.work_dir is not None:
+            # query results are checkpointed per chunk
+            chunk_size = 10000
+
+        self.stats = BlockingStats()
+        if chunk_size is None:
+            n_rows = len(self.dfs[-1]) + (0 if self.self_join else len(self.dfs[0]))
+            with self.stats.stage(
+                "convert", rows=n_rows, text="Convert time: {milliseconds:.0f} ms"
+            ):
+                data = self.vectorizer(self.dfs[-1])
+                if self.self_join:
+                    queries = data
+                else:
+                    queries = self.vectorizer(self.dfs[0])
+            with self.stats.stage(
+                "index",
+                rows=len(self.dfs[-1]),
+                text="Index time: {milliseconds:.0f} ms",
+            ):
+                self.indexer.build_index(data)
+            self.stats.index_bytes = self.indexer.index_nbytes
+
+            with self.stats.stage(
+                "query",
+                queries=len(self.dfs[0]),
+                text="Total Query time: {milliseconds:.0f} ms",
+            ):
+                scores, indices = self.search(queries, batch_size=batch_size, k=k)
+        else:
+            total_scores, total_indices = [], []
+            for _, scores, indices in self._pipeline(
+                batch_size, k, chunk_size, prefetch
+            ):
+                total_scores.append(scores)
+                total_indices.append(indices)
+
+            if total_indices:
+                scores = np.concatenate(total_scores)
+                indices = np.concatenate(total_indices)
+            else:
+                scores = np.empty((0, k), dtype=np.float32)
+                indices = np.empty((0, k), dtype=np.int64)
+
+        with self.stats.stage("assemble", queries=len(self.dfs[0])):
+            candidates = self.assemble(scores, indices)
+        self.stats.n_candidates = candidates.n_pairs
+
+        return candidates
+
+    def stream(
+        self,
+        batch_size: int = 128,
+        k: int = 100,
+        chunk_size: int = 10000,
+        sink: Optional[str] = None,
+        prefetch: int = 1,
+    ) -> Iterator[CandidateSet]:
+        """
+        Vectorize and search the queries ``chunk_size`` rows at a time and yield
+        the candidates of each chunk as soon as they are found, optionally
+        appending them to the Parquet file ``sink``.
+
+        Pairs already yielded by an earlier chunk are dropped, so a pair keeps the
+        rank of the chunk that found it first rather than its best overall rank.
+        The data is still vectorized and indexed as a whole before the first chunk.
+        """
+        self.stats = BlockingStats(n_candidates=0)
+        seen = np.empty(0, dtype=np.int64)
+        writer = None
+        try:
+            for offset, scores, indices in self._pipeline(
+                batch_size, k, chunk_size, prefetch
+            ):
+                with self.stats.stage("assemble", queries=len(indices)):
+                    candidates = self.assemble(
+                        scores, indices, offset=offset, seen=seen
+                    )
+                self.stats.n_candidates += candidates.n_pairs
+
+                if len(self.dfs) == 1:
+                    # only dirty ER can meet the same pair again in a later chunk,
+                    # and only through its larger position as one of the queries
+                    n, end = len(self.dfs[-1]), offset + len(indices)
+                    keys = candidates.left * n + candidates.right
+                    seen = np.union1d(seen, keys)
+                    seen = seen[seen % n >= end]
+
+                if sink is not None:
+                    table = pa.Table.from_pandas(
+                        candidates.to_frame(), preserve_index=False
+                    )
+                    if writer is None:
+                        writer = pq.ParquetWriter(sink, table.schema)
+                    writer.write_table(table)
+
+                yield candidates
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def multi_source(
+        self,
+        batch_size: int = 128,
+        k: int = 100,
+        shared_index: bool = False,
+    ) -> dict[tuple[int, int], CandidateSet]:
+        """
+        Block every pair of tables in ``dfs`` and return the candidates keyed by
+        ``(i, j)`` with ``i < j``: the ``k`` nearest records of ``dfs[j]`` for
+        each record of ``dfs[i]``.
+
+        Each table is vectorized once. By default one index is built per table
+        ``j`` and searched by every table before it. With ``shared_index`` one
+        index is built over all tables; it is searched with more neighbors than
+        ``k``, doubled for the records that still lack ``k`` hits in some later
+        table, as hits from the record's own and earlier tables are dropped.
+        """
+        self.stats = BlockingStats(index_bytes=0)
+        sizes = [len(df) for df in self.dfs]
+        with self.stats.stage(
+            "convert", rows=sum(sizes), text="Convert time: {milliseconds:.0f} ms"
+        ):
+            vectors = [self.vectorizer(df) for df in self.dfs]
+
+        results = {}
+        if shared_index:
+            bounds = np.cumsum([0] + sizes)
+            with self.stats.stage(
+                "index", rows=sum(sizes), text="Index time: {milliseconds:.0f} ms"
+            ):
+                self.indexer.build_index(concat_vectors(vectors))
+            self.stats.index_bytes = self.indexer.index_nbytes
 
-        total_indices = []
-        with Timer(text="Total Query time: {milliseconds:.0f} ms"):
-            for b_queries in chunks(queries, batch_size):
-                _, b_indices = self.indexer.batch_search(b_queries, k=k)
-                total_indices.extend(b_indices)
-
-        candidates = []
-        flags = set()  # Comparison Propagation
-        for i in range(k):
-            cands = set()
-            for j in range(len(total_indices)):
-                if i >= len(total_indices[j]):
-                    continue
-
-                ind1 = j
-                ind2 = total_indices[j][i]
-                if len(self.dfs) == 1 and ind1 > ind2:
-                    ind1, ind2 = ind2, ind1
-
-                id1 = self.dfs[0].index[ind1]
-                id2 = self.dfs[-1].index[ind2]
-                pair = id1, id2
-                if id1 != id2 and pair not in flags:
-                    cands.add(pair)
-                    flags.add(pair)
-
-            candidates.append(cands)
+            with self.stats.stage(
+                "query",
+                queries=sum(sizes[:-1]),
+                text="Total Query time: {milliseconds:.0f} ms",
+            ):
+                for i in range(len(self.dfs) - 1):
+                    per_table = self._search_later_tables(
+                        vectors[i], i, bounds, batch_size, k
+                    )
+                    for j, (scores, indices) in per_table.items():
+                        results[i, j] = dedup_pairs(
+                            *flatten_results(scores, indices), n_right=sizes[j]
+                        )
+        else:
+            for j in range(1, len(self.dfs)):
+                # a fresh copy per table; build_index replaces the built index
+                indexer = copy.copy(self.indexer)
+                with self.stats.stage(
+                    f"index_{j}",
+                    rows=sizes[j],
+                    text=f"Index {j} time: {{milliseconds:.0f}} ms",
+                ):
+                    indexer.build_index(vectors[j])
+                if self.stats.index_bytes is not None:
+                    nbytes = indexer.index_nbytes
+                    self.stats.index_bytes = (
+                        None if nbytes is None else self.stats.index_bytes + nbytes
+                    )
+                with self.stats.stage(
+                    f"query_{j}",
+                    queries=sum(sizes[:j]),
+                    text=f"Query {j} time: {{milliseconds:.0f}} ms",
+                ):
+                    for i in range(j):
+                        scores, indices = self.search(
+                            vectors[i], batch_size=batch_size, k=k, indexer=indexer
+                        )
+                        results[i, j] = dedup_pairs(
+                            *flatten_results(scores, indices), n_right=len(self.dfs[j])
+                        )
+                del indexer
+
+        candidates = {
+            (i, j): CandidateSet(
+                *results[i, j], self.dfs[i].index, self.dfs[j].index, k
+            )
+            for i, j in sorted(results)
+        }
+        self.stats.n_candidates = sum(c.n_pairs for c in candidates.values())
 
         return candidates
+
+    def _search_later_tables(
+        self,
+        queries,
+        i: int,
+        bounds: np.ndarray,
+        batch_size: int,
+        k: int,
+    ) -> dict[int, tuple[np.ndarray, np.ndarray]]:
+        """
+        Search the shared index of all tables for the ``k`` nearest records of
+        ``queries`` (from table ``i``) in every later table, as (n, k) results with
+        positions into that table.
+        """
+        n_queries, n_total = queries.shape[0], bounds[-1]
+        later = range(i + 1, len(bounds) - 1)
+        need = {j: min(k, bounds[j + 1] - bounds[j]) for j in later}
+        results = {
+            j: (
+                np.full((n_queries, k), np.nan, dtype=np.float32),
+                np.full((n_queries, k), -1, dtype=np.int64),
+            )
+            for j in later
+        }
+
+        rows = np.arange(n_queries)
+        n = min(k * (len(bounds) - 1), n_total)
+        while len(rows):
+            scores, indices = self.search(
+                take_vectors(queries, rows), batch_size=batch_size, k=n
+            )
+            source = np.searchsorted(bounds, indices, side="right") - 1
+            done = np.ones(len(rows), dtype=bool)
+            for j in later:
+                hits = (source == j) & (indices >= 0)
+                # the first k hits of table j in each row, in rank order
+                slot = np.cumsum(hits, axis=1) - 1
+                r, c = np.nonzero(hits & (slot < k))
+                scores_j, indices_j = results[j]
+                scores_j[rows[r], slot[r, c]] = scores[r, c]
+                indices_j[rows[r], slot[r, c]] = indices[r, c] - bounds[j]
+                done &= hits.sum(axis=1) >= need[j]
+            if n == n_total:
+                break
+            rows, n = rows[~done], min(2 * n, n_total)
+        return results
+
+    def _pipeline(
+        self,
+        batch_size: int,
+        k: int,
+        chunk_size: int,
+        prefetch: int,
+    ) -> Iterator[tuple[int, np.ndarray, np.ndarray]]:
+        if self.work_dir is not None:
+            self._check_manifest(k, chunk_size)
+        with self.stats.stage(
+            "convert",
+            rows=len(self.dfs[-1]),
+            text="Convert time: {milliseconds:.0f} ms",
+        ):
+            data = self._vectorize(self.dfs[-1], "data")
+
+        offsets = range(0, len(self.dfs[0]), chunk_size)
+        done = set()
+        if self.work_dir is not None:
+            done = {o for o in offsets if self._results_path(o).exists()}
+        todo = [o for o in offsets if o not in done]
+        if self.self_join:
+            query_chunks = (
+                (offset, data[offset : offset + chunk_size], 0.0) for offset in todo
+            )
+        else:
+            # start encoding the first query chunks while the index is built
+            query_chunks = self._encode_chunks(todo, chunk_size, prefetch)
+        with self.stats.stage(
+            "index", rows=len(self.dfs[-1]), text="Index time: {milliseconds:.0f} ms"
+        ):
+            self._build_index(data)
+        self.stats.index_bytes = self.indexer.index_nbytes
+
+        encode_time, search_time = 0.0, 0.0
+        for offset in offsets:
+            # only waiting for the chunk and searching it count as query time,
+            # not what the caller does with the results in between
+            n_queries = min(chunk_size, len(self.dfs[0]) - offset)
+            with self.stats.stage("query", queries=n_queries):
+                if offset in done:
+                    scores, indices = load_results(self._results_path(offset))
+                else:
+                    _, queries, elapsed = next(query_chunks)
+                    start = time.perf_counter()
+                    scores, indices = self.search(queries, batch_size=batch_size, k=k)
+                    search_time += time.perf_counter() - start
+                    encode_time += elapsed
+                    if self.work_dir is not None:
+                        save_results(self._results_path(offset), scores, indices)
+            yield offset, scores, indices
+
+        query_stats = self.stats.stages.setdefault("query", StageStats())
+        print(f"Total Query time: {query_stats.wall_time * 1000:.0f} ms")
+        # compared with encoding and then searching each chunk in turn
+        saved = encode_time + search_time - query_stats.wall_time
+        self.stats.saved_time = saved
+        print(f"Pipeline saved time: {saved * 1000:.0f} ms")
+
+    def _vectorize(self, df: pd.DataFrame, name: str):
+        """
+        Vectorize ``df``. With a ``work_dir`` this is done in shards of
+        ``shard_size`` rows that are saved, and loaded again on a restart.
+        """
+        if self.work_dir is None or len(df) == 0:
+            return self.vectorizer(df)
+
+        shards = []
+        for offset in range(0, len(df), self.shard_size):
+            stem = self.work_dir / f"{name}-{offset:012d}"
+            vectors = load_vectors(stem)
+            if vectors is None:
+                vectors = self.vectorizer(df.iloc[offset : offset + self.shard_size])
+                save_vectors(stem, vectors)
+            shards.append(vectors)
+        return concat_vectors(shards)
+
+    def _build_index(self, data) -> None:
+        """Build the index, or load the one a previous run saved to ``work_dir``."""
+        if self.work_dir is None:
+            self.indexer.build_index(data)
+            return
+
+        index_dir = self.work_dir / "index"
+        if index_dir.exists():
+            try:
+                self.indexer.load_index(str(index_dir))
+                return
+            except NotImplementedError:
+                pass
+
+        self.indexer.build_index(data)
+        tmp_dir = self.work_dir / "index.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir()
+        try:
+            self.indexer.save_index(str(tmp_dir))
+        except NotImplementedError:
+            shutil.rmtree(tmp_dir)
+        else:
+            os.replace(tmp_dir, index_dir)
+
+    def _check_manifest(self, k: int, chunk_size: int) -> None:
+        """Record the run configuration in ``work_dir``, or check it matches."""
+        manifest = {
+            "k": k,
+            "chunk_size": chunk_size,
+            "shard_size": self.shard_size,
+            "n_queries": len(self.dfs[0]),
+            "n_data": len(self.dfs[-1]),
+            "self_join": self.self_join,
+            "vectorizer": _type_name(self.vectorizer),
+            "indexer": _type_name(self.indexer),
+        }
+        path = self.work_dir / "manifest.json"
+        if path.exists():
+            saved = json.loads(path.read_text())
+            changed = sorted(key for key in manifest if saved.get(key) != manifest[key])
+            if changed:
+                raise ValueError(
+                    f"{self.work_dir} holds a run with other {', '.join(changed)}; "
+                    "use a new work_dir or delete it"
+                )
+        else:
+            path.with_suffix(".tmp").write_text(json.dumps(manifest))
+            os.replace(path.with_suffix(".tmp"), path)
+
+    def _results_path(self, offset: int) -> Path:
+        return self.work_dir / "results" / f"{offset:012d}.npz"
+
+    def _encode_chunks(
+        self,
+        offsets: list[int],
+        chunk_size: int,
+        prefetch: int,
+    ) -> Iterator[tuple[int, Any, float]]:
+        """
+        Vectorize the query chunks at ``offsets`` in a worker thread, keeping at
+        most ``prefetch`` chunks in flight; with ``prefetch=0`` they are
+        vectorized on demand.
+        """
+        offsets = iter(offsets)
+
+        def encode(offset):
+            start = time.perf_counter()
+            queries = self.vectorizer(self.dfs[0].iloc[offset : offset + chunk_size])
+            return offset, queries, time.perf_counter() - start
+
+        if prefetch <= 0:
+            return map(encode, offsets)
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        pending = deque()
+
+        def fill():
+            while len(pending) < prefetch:
+                offset = next(offsets, None)
+                if offset is None:
+                    break
+                pending.append(executor.submit(encode, offset))
+
+        def consume():
+            try:
+                while pending:
+                    result = pending.popleft().result()
+                    fill()
+                    yield result
+            finally:
+                executor.shutdown(cancel_futures=True)
+
+        fill()
+        return consume()
+
+    def search(
+        self,
+        queries,
+        batch_size: int = 128,
+        k: int = 100,
+        indexer: Optional[Indexer] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        indexer = indexer or self.indexer
+        total_scores, total_indices = [], []
+        for b_queries in chunks(queries, batch_size):
+            b_scores, b_indices = indexer.batch_search(b_queries, k=k)
+            b_scores, b_indices = pad_results(b_scores, b_indices, k)
+            total_scores.append(b_scores)
+            total_indices.append(b_indices)
+
+        if total_indices:
+            scores = np.concatenate(total_scores)
+            indices = np.concatenate(total_indices)
+        else:
+            scores = np.empty((0, k), dtype=np.float32)
+            indices = np.empty((0, k), dtype=np.int64)
+
+        return scores, indices
+
+    def assemble(
+        self,
+        scores: np.ndarray,
+        indices: np.ndarray,
+        offset: int = 0,
+        seen: Optional[np.ndarray] = None,
+    ) -> CandidateSet:
+        """
+        Turn (n_queries, k) arrays of search results into a ``CandidateSet``.
+
+        Row ``i`` holds the results of query ``offset + i``. Pairs are visited rank
+        by rank and, within a rank, query by query, see ``dedup_pairs``.
+        """
+        left, right, rank, score = flatten_results(scores, indices, offset)
+        left, right, rank, score = dedup_pairs(
+            left,
+            right,
+            rank,
+            score,
+            n_right=len(self.dfs[-1]),
+            dirty=len(self.dfs) == 1,
+            seen=seen,
+        )
+
+        left_index, right_index = self.dfs[0].index, self.dfs[-1].index
+        if len(self.dfs) != 1:
+            mask = left_index.to_numpy()[left] != right_index.to_numpy()[right]
+            left, right, rank, score = left[mask], right[mask], rank[mask], score[mask]
+
+        return CandidateSet(
+            left, right, rank, score, left_index, right_index, indices.shape[1]
+        )
@@ -0,0 +1,88 @@
+import json
+import resource
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Iterator, Optional
+
+
+def _max_rss() -> int:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@dataclass
+class StageStats:
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    peak_rss_delta: int = 0
+    rows: int = 0
+    queries: int = 0
+
+    @property
+    def rows_per_sec(self) -> Optional[float]:
+        return self.rows / self.wall_time if self.rows and self.wall_time else None
+
+    @property
+    def queries_per_sec(self) -> Optional[float]:
+        return (
+            self.queries / self.wall_time if self.queries and self.wall_time else None
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            **asdict(self),
+            "rows_per_sec": self.rows_per_sec,
+            "queries_per_sec": self.queries_per_sec,
+        }
+
+
+@dataclass
+class BlockingStats:
+    """
+    Performance report of one blocking run: per-stage wall time and CPU time in
+    seconds, growth of the peak RSS in bytes and throughput, plus the index size
+    in bytes and the number of candidate pairs.
+    """
+
+    stages: dict[str, StageStats] = field(default_factory=dict)
+    index_bytes: Optional[int] = None
+    n_candidates: Optional[int] = None
+    saved_time: Optional[float] = None
+
+    @contextmanager
+    def stage(
+        self,
+        name: str,
+        rows: int = 0,
+        queries: int = 0,
+        text: Optional[str] = None,
+    ) -> Iterator[StageStats]:
+        """
+        Measure the enclosed block as stage ``name`` and print ``text`` formatted
+        with its ``milliseconds`` like a ``codetiming.Timer`` would. Timings add
+        up if the stage is entered again.
+        """
+        stats = self.stages.setdefault(name, StageStats())
+        stats.rows += rows
+        stats.queries += queries
+        wall, cpu, rss = time.perf_counter(), time.process_time(), _max_rss()
+        try:
+            yield stats
+        finally:
+            stats.wall_time += time.perf_counter() - wall
+            stats.cpu_time += time.process_time() - cpu
+            stats.peak_rss_delta += _max_rss() - rss
+            if text is not None:
+                print(text.format(milliseconds=stats.wall_time * 1000))
+
+    def to_dict(self) -> dict:
+        return {
+            "stages": {name: s.to_dict() for name, s in self.stages.items()},
+            "index_bytes": self.index_bytes,
+            "n_candidates": self.n_candidates,
+            "saved_time": self.saved_time,
+        }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
@@ -1,7 +1,15 @@
-from .dense_vectorizer import DenseVectorizer
 from .sparse_vectorizer import SparseVectorizer
 
 __all__ = [
     "DenseVectorizer",
     "SparseVectorizer",
 ]
+
+
+def __getattr__(name: str):
+    # torch is only imported with DenseVectorizer
+    if name == "DenseVectorizer":
+        from .dense_vectorizer import DenseVectorizer
+
+        return DenseVectorizer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")